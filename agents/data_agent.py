@@ -5,12 +5,15 @@ import requests
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 import asyncio
+import httpx
 
 # Импортируем DatadogClient
 from core.datadog_client import DatadogClient, DatadogConnectionError, DatadogAuthenticationError, DatadogAPIError
+from core.datadog_utils import parse_single_series
 
 class DataAgent:
-    def __init__(self, dd_api_key: Optional[str] = None, dd_app_key: Optional[str] = None):
+    def __init__(self, dd_api_key: Optional[str] = None, dd_app_key: Optional[str] = None,
+                 http_client: Optional[httpx.AsyncClient] = None):
         self.logger = logging.getLogger(__name__)
         
         # Инициализация встроенного форматировщика
@@ -20,8 +23,9 @@ class DataAgent:
         self.data = None  # Будет загружен при первом обращении
         
         # Настройки Datadog API
-        self.DD_API_KEY = dd_api_key or "3cb244343cf0b67a853fab8dd26adace"
-        self.DD_APP_KEY = dd_app_key or "1879f3e74ab7e870e5fb9e1558f4427633cb1bcc"
+        # Ключи передаются явно (ключи сервиса) или берутся из окружения DD_API_KEY / DD_APP_KEY
+        self.DD_API_KEY = dd_api_key or os.getenv("DD_API_KEY", "")
+        self.DD_APP_KEY = dd_app_key or os.getenv("DD_APP_KEY", "")
         self.DATADOG_SITE = "datadoghq.eu"
         self.API_BASE = f"https://api.{self.DATADOG_SITE}"
         self.HEADERS = {
@@ -43,7 +47,7 @@ class DataAgent:
         
         # Инициализация DatadogClient
         try:
-            self.datadog_client = DatadogClient(api_key=self.DD_API_KEY, app_key=self.DD_APP_KEY)
+            self.datadog_client = DatadogClient(api_key=self.DD_API_KEY, app_key=self.DD_APP_KEY, http_client=http_client)
             print(f"[DataAgent] Инициализирован с Datadog API: {self.API_BASE}")
         except Exception as e:
             self.logger.error(f"Ошибка инициализации DatadogClient: {e}")
@@ -69,17 +73,14 @@ class DataAgent:
                 output.append("📊 КЛЮЧЕВЫЕ МЕТРИКИ:")
                 for metric_data in series[:3]:  # Максимум 3 метрики
                     metric_name = metric_data.get("metric", "unknown")
-                    pointlist = metric_data.get("pointlist", [])
-                    unit = metric_data.get("unit", [{}])
+                    points = metric_data.get("points", [])
+                    unit = metric_data.get("unit") or {}
                     
-                    # Берем последнее значение из pointlist
-                    if pointlist:
-                        latest_value = pointlist[-1][1] if len(pointlist[-1]) > 1 else 0
-                    else:
-                        latest_value = 0
+                    # Берем последнее значение из points
+                    latest_value = points[-1][1] if points else 0
                     
                     # Получаем единицу измерения
-                    unit_name = unit[0].get("name", "") if unit else ""
+                    unit_name = unit.get("name", "")
                     
                     # Форматируем значения по типу метрики
                     if "cpu" in metric_name.lower():
@@ -314,18 +315,13 @@ class DataAgent:
                 if response.status_code == 200:
                     data = response.json()
                     
-                    # Извлекаем только ключевые поля согласно структуре JSON
+                    # Серия нормализуется parse_single_series: points - пары [timestamp, value]
                     if data.get("series"):
-                        series_data = data["series"][0]
-                        
-                        # Упрощенная структура - только нужные поля
                         simplified_metric = {
+                            **parse_single_series(data["series"][0]).to_dict(),
                             "query": data.get("query", metric_query),           # Запрос
                             "from_date": data.get("from_date"),                 # Начальная дата
-                            "to_date": data.get("to_date"),                     # Конечная дата
-                            "metric": series_data.get("metric"),               # Имя метрики
-                            "pointlist": series_data.get("pointlist", []),     # Массив точек [timestamp, value]
-                            "unit": series_data.get("unit", [{"family": "general", "name": "unit"}])  # Единица измерения
+                            "to_date": data.get("to_date")                      # Конечная дата
                         }
                         
                         results["series"].append(simplified_metric)
@@ -428,6 +424,14 @@ class DataAgent:
             with open(save_path, 'w', encoding='utf-8') as f:
                 json.dump(data_to_save, f, indent=2, ensure_ascii=False)
             
+            # Краткие метаданные рядом с файлом: /system-stats читает их без разбора всех данных
+            meta = {
+                "collection_timestamp": data_to_save["collection_metadata"]["timestamp"],
+                "records_count": data_to_save["collection_metadata"]["total_logs"]
+            }
+            with open(os.path.join(data_dir, 'collected_data.meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            
             print(f"[DataAgent] Данные сохранены в {save_path}")
             print(f"[DataAgent] Сохранено логов: {len(collected_data.get('logs', []))}, метрик: {len(collected_data.get('metrics', []))}")
             
@@ -739,7 +743,7 @@ class DataAgent:
             output.append("📊 СИСТЕМНЫЕ МЕТРИКИ:")
             for serie in series[:5]:  # Ограничиваем количество серий
                 metric_name = serie.get("metric", "unknown")
-                points = serie.get("pointlist", [])
+                points = serie.get("points", [])
                 
                 if points:
                     # Берем последние значения
@@ -817,7 +821,7 @@ class DataAgent:
                 
                 if series:
                     latest_serie = series[0]
-                    points = latest_serie.get("pointlist", [])
+                    points = latest_serie.get("points", [])
                     if points:
                         latest_point = points[-1]
                         if len(latest_point) >= 2:
@@ -678,6 +678,64 @@ class ProtocolAgent:
         
         return recommendations[:10]  # Limit to top 10 recommendations
 
+    def recommend_for_issues(self, issues: List[Any]) -> List[str]:
+        """
+        Рекомендации по выявленным проблемам (без общих рекомендаций-заглушек)
+        
+        Args:
+            issues: Проблемы, выявленные при анализе (строки или словари)
+            
+        Returns:
+            List[str]: Рекомендации по категориям найденных проблем; пустой список,
+            если ни одна проблема не распознана
+        """
+        recommendations = []
+        for issue in issues:
+            text = issue if isinstance(issue, str) else json.dumps(issue, ensure_ascii=False, default=str)
+            text = text.lower()
+            for keywords, category_recommendations in self._issue_recommendations:
+                if any(keyword in text for keyword in keywords):
+                    recommendations.extend(category_recommendations)
+        
+        # Без дубликатов с сохранением порядка
+        return list(dict.fromkeys(recommendations))[:10]
+
+    # Ключевые слова проблем и соответствующие рекомендации
+    _issue_recommendations = (
+        (("cpu", "процессор"), [
+            "Identify processes with the highest CPU consumption",
+            "Consider horizontal scaling or raising CPU limits"
+        ]),
+        (("memory", "memory leak", "oom", "памят"), [
+            "Check for memory leaks and heap growth",
+            "Review memory limits and garbage collection settings"
+        ]),
+        (("disk", "диск"), [
+            "Free disk space or extend the volume",
+            "Check log rotation and temporary file cleanup"
+        ]),
+        (("latency", "response time", "timeout", "slow", "задержк", "таймаут"), [
+            "Profile slow endpoints and downstream dependencies",
+            "Review timeouts and connection pool sizes"
+        ]),
+        (("auth", "401", "403", "авторизац", "аутентификац"), [
+            "Verify credentials, tokens and their expiration",
+            "Review recent access policy changes"
+        ]),
+        (("connection", "network", "dns", "соединен", "сетев", "сети"), [
+            "Check network connectivity and DNS resolution between services",
+            "Verify availability of dependent services"
+        ]),
+        (("database", "sql", "query", "баз данных", "бд"), [
+            "Review slow queries and database connection pool usage",
+            "Check database health and replication status"
+        ]),
+        (("error", "exception", "5xx", "500", "ошибк"), [
+            "Review error logs for the affected services",
+            "Set up monitoring and alerting for this error type"
+        ]),
+    )
+
     def _determine_severity(self, level: str, error_code: str) -> str:
         """Определяет серьезность ошибки на основе уровня и кода"""
         if level.upper() in ['CRITICAL', 'FATAL', 'ERROR']:
@@ -1,13 +1,20 @@
 # Core package for AI Orchestrator
 from core.orchestrator import AIOrchestrator
 from core.reasoning_state import ReasoningState, ReasoningStep, ReasoningPhase
-from core.reasoning_trace import tracer, ReasoningTracer
+from core.reasoning_trace import ReasoningTracer, get_tracer
 
 __all__ = [
     "AIOrchestrator",
     "ReasoningState", 
     "ReasoningStep",
     "ReasoningPhase",
-    "tracer",
-    "ReasoningTracer"
-]
\ No newline at end of file
+    "ReasoningTracer",
+    "get_tracer"
+]
+
+
+def __getattr__(name):
+    """from core import tracer: глобальный трассировщик создается при первом обращении (PEP 562)"""
+    if name == "tracer":
+        return get_tracer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
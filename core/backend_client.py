@@ -1,6 +1,8 @@
+import asyncio
+import contextlib
 import httpx
 import logging
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional
 from datetime import datetime
 from colorama import Fore, Style
 
@@ -10,6 +12,10 @@ class BackendClientError(Exception):
     """Базовое исключение для ошибок клиента бекенда"""
     pass
 
+class AuthenticationError(BackendClientError):
+    """Исключение когда бекенд отклонил Bearer токен (HTTP 401)"""
+    pass
+
 class ServiceNotFoundError(BackendClientError):
     """Исключение когда сервис не найден"""
     pass
@@ -24,7 +30,8 @@ class BackendClient:
     Обеспечивает получение данных сервисов и сообщений чата
     """
     
-    def __init__(self, base_url: str = "http://45.133.74.188:8080", timeout: int = 30, bearer_token: str = None):
+    def __init__(self, base_url: str = "http://45.133.74.188:8080", timeout: int = 30, bearer_token: str = None,
+                 http_client: Optional[httpx.AsyncClient] = None):
         """
         Инициализация клиента бекенда
         
@@ -32,10 +39,12 @@ class BackendClient:
             base_url: Базовый URL бекенда
             timeout: Таймаут запросов в секундах
             bearer_token: Bearer токен для аутентификации
+            http_client: Общий HTTP клиент с пулом соединений (None - клиент на каждый запрос)
         """
         self.base_url = base_url.rstrip('/')
         self.timeout = timeout
         self.bearer_token = bearer_token
+        self.http_client = http_client
         self.logger = logging.getLogger(__name__)
         
         # Настройка заголовков по умолчанию
@@ -47,6 +56,15 @@ class BackendClient:
         # Добавляем Authorization заголовок если токен предоставлен
         if self.bearer_token:
             self.default_headers["Authorization"] = f"Bearer {self.bearer_token}"
+    
+    @contextlib.asynccontextmanager
+    async def _client(self) -> AsyncIterator[httpx.AsyncClient]:
+        """HTTP клиент для запроса: общий (соединения переиспользуются) или временный"""
+        if self.http_client is not None:
+            yield self.http_client
+        else:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                yield client
         
     async def get_service_info(self, service_id: str) -> Dict[str, Any]:
         """
@@ -59,16 +77,20 @@ class BackendClient:
             Dict с информацией о сервисе
             
         Raises:
+            AuthenticationError: Если токен отклонен
             ServiceNotFoundError: Если сервис не найден
             BackendClientError: При других ошибках API
         """
         url = f"{self.base_url}/api/services/{service_id}"
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(url, headers=self.default_headers)
+            async with self._client() as client:
+                response = await client.get(url, headers=self.default_headers, timeout=self.timeout)
                 
-                if response.status_code == 404:
+                if response.status_code == 401:
+                    self.logger.error(f"Токен отклонен при получении сервиса {service_id}")
+                    raise AuthenticationError(f"Ошибка аутентификации при получении сервиса {service_id}")
+                elif response.status_code == 404:
                     self.logger.error(f"Сервис {service_id} не найден")
                     raise ServiceNotFoundError(f"Сервис {service_id} не найден")
                 elif response.status_code != 200:
@@ -84,6 +106,8 @@ class BackendClient:
                 
                 return result
                 
+        except BackendClientError:
+            raise
         except httpx.RequestError as e:
             self.logger.error(f"Ошибка сети при получении сервиса {service_id}: {e}")
             raise BackendClientError(f"Ошибка сети: {e}")
@@ -102,16 +126,20 @@ class BackendClient:
             Dict с сообщениями: messages, sessionId, serviceId
             
         Raises:
+            AuthenticationError: Если токен отклонен
             SessionNotFoundError: Если сессия не найдена
             BackendClientError: При других ошибках API
         """
         url = f"{self.base_url}/api/sessions/{session_id}/get_messages"
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(url, headers=self.default_headers)
+            async with self._client() as client:
+                response = await client.get(url, headers=self.default_headers, timeout=self.timeout)
                 
-                if response.status_code == 404:
+                if response.status_code == 401:
+                    self.logger.error(f"Токен отклонен для сессии {session_id}")
+                    raise AuthenticationError(f"Ошибка аутентификации для сессии {session_id}")
+                elif response.status_code == 404:
                     self.logger.error(f"Сессия {session_id} не найдена")
                     raise SessionNotFoundError(f"Сессия {session_id} не найдена")
                 elif response.status_code != 200:
@@ -150,13 +178,12 @@ class BackendClient:
         """
         try:
             # Выполняем запросы параллельно для ускорения
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                service_task = self.get_service_info(service_id)
-                messages_task = self.get_chat_messages(session_id)
-                
-                service_data, chat_data = await asyncio.gather(service_task, messages_task)
-                
-                return service_data, chat_data
+            service_data, chat_data = await asyncio.gather(
+                self.get_service_info(service_id),
+                self.get_chat_messages(session_id)
+            )
+            
+            return service_data, chat_data
                 
         except Exception as e:
             self.logger.error(f"Ошибка при получении данных сервиса {service_id} и сессии {session_id}: {str(e)}")
@@ -175,6 +202,7 @@ class BackendClient:
             Dict с результатом добавления сообщения
             
         Raises:
+            AuthenticationError: Если токен отклонен
             SessionNotFoundError: Если сессия не найдена
             BackendClientError: При других ошибках API
         """
@@ -186,10 +214,13 @@ class BackendClient:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload, headers=self.default_headers)
+            async with self._client() as client:
+                response = await client.post(url, json=payload, headers=self.default_headers, timeout=self.timeout)
                 
-                if response.status_code == 404:
+                if response.status_code == 401:
+                    self.logger.error(f"Токен отклонен при добавлении сообщения в сессию {session_id}")
+                    raise AuthenticationError(f"Ошибка аутентификации при добавлении сообщения в сессию {session_id}")
+                elif response.status_code == 404:
                     self.logger.error(f"Сессия {session_id} не найдена")
                     raise SessionNotFoundError(f"Сессия {session_id} не найдена")
                 elif response.status_code not in [200, 201]:
@@ -198,6 +229,8 @@ class BackendClient:
                 
                 return response.json()
                 
+        except BackendClientError:
+            raise
         except httpx.RequestError as e:
             self.logger.error(f"Ошибка сети при добавлении сообщения: {e}")
             raise BackendClientError(f"Ошибка сети: {e}")
@@ -9,6 +9,11 @@ class ContextFormatter:
     Форматирует сообщения чата в контекст для AI агентов
     """
     
+    # Заголовки секций контекста
+    _HISTORY_HEADER = "=== История чата ==="
+    _TRUNCATED_HISTORY_HEADER = "=== История чата (сокращено) ==="
+    _NEW_REQUEST_HEADER = "=== Новый запрос ==="
+    
     def __init__(self, max_context_length: int = 4000, max_messages: int = 20):
         """
         Args:
@@ -44,16 +49,10 @@ class ContextFormatter:
             sorted_messages = sorted_messages[-self.max_messages:]
             self.logger.info(f"Ограничено до {self.max_messages} последних сообщений")
         
-        # Форматируем историю
-        context_parts = []
-        context_parts.append("=== История чата ===")
-        
-        for message in sorted_messages:
-            formatted_message = self._format_single_message(message)
-            context_parts.append(formatted_message)
-        
-        # Добавляем новый промпт
-        context_parts.append("=== Новый запрос ===")
+        # Форматируем историю и новый промпт одним списком частей
+        context_parts = [self._HISTORY_HEADER]
+        context_parts.extend(map(self._format_single_message, sorted_messages))
+        context_parts.append(self._NEW_REQUEST_HEADER)
         context_parts.append(f"User: {new_prompt}")
         
         # Объединяем и проверяем длину
@@ -158,7 +157,7 @@ class ContextFormatter:
         """
         # Всегда сохраняем новый промпт и заголовки
         essential_parts = [
-            "=== Новый запрос ===",
+            self._NEW_REQUEST_HEADER,
             f"User: {new_prompt}"
         ]
         essential_length = len("\n\n".join(essential_parts))
@@ -171,20 +170,21 @@ class ContextFormatter:
             return "\n\n".join(essential_parts)
         
         # Берем историю с конца, пока помещается
-        history_parts = ["=== История чата (сокращено) ==="]
-        current_length = len(history_parts[0])
+        current_length = len(self._TRUNCATED_HISTORY_HEADER)
+        kept_parts = []
         
         # Идем с конца истории (исключая заголовки нового запроса)
         for part in reversed(context_parts[1:-2]):  # пропускаем заголовки
             part_length = len(part) + 2  # +2 для \n\n
             if current_length + part_length <= available_length:
-                history_parts.insert(1, part)  # вставляем в начало после заголовка
+                kept_parts.append(part)
                 current_length += part_length
             else:
                 break
         
-        # Объединяем все части
-        result_parts = history_parts + essential_parts
+        # Части собраны от новых к старым - разворачиваем один раз вместо вставок в начало списка
+        kept_parts.reverse()
+        result_parts = [self._TRUNCATED_HISTORY_HEADER, *kept_parts, *essential_parts]
         result = "\n\n".join(result_parts)
         
         self.logger.info(f"Контекст обрезан до {len(result)} символов")
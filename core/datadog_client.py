@@ -3,20 +3,32 @@ DatadogClient - клиент для работы с Datadog API
 Обеспечивает получение метрик и данных временных рядов из Datadog
 """
 
+import contextlib
+import functools
 import httpx
 import json
-from typing import Dict, List, Any, Optional
+import time
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import asyncio
 from .datadog_utils import (
     safe_iterate_dict,
     parse_datadog_timeseries_response,
+    parse_single_series,
     parse_datadog_metrics_list,
-    validate_datadog_response,
-    log_datadog_response_structure
+    validate_datadog_response
 )
 
 
+@functools.lru_cache(maxsize=512)
+def _build_query(metric_name: str, tags: Optional[Tuple[str, ...]] = None) -> str:
+    """Формирует query для v1/v2 API; результат кэшируется по (метрика, теги)"""
+    if tags:
+        # Добавляем теги в формате {tag1:value1,tag2:value2}
+        return f"avg:{metric_name}{{{','.join(tags)}}}"
+    return f"avg:{metric_name}{{*}}"
+
+
 class DatadogConnectionError(Exception):
     """Исключение для ошибок подключения к Datadog API"""
     pass
@@ -35,19 +47,21 @@ class DatadogAPIError(Exception):
 class DatadogClient:
     """Клиент для работы с Datadog API"""
     
-    def __init__(self, api_key: str, app_key: str):
+    def __init__(self, api_key: str, app_key: str, http_client: Optional[httpx.AsyncClient] = None):
         """
         Инициализация клиента Datadog
         
         Args:
             api_key: API ключ Datadog
             app_key: Application ключ Datadog
+            http_client: Общий HTTP клиент с пулом соединений (None - клиент на каждый запрос)
         """
         if not api_key or not app_key:
             raise DatadogAuthenticationError("API key и Application key обязательны для работы с Datadog")
             
         self.api_key = api_key
         self.app_key = app_key
+        self.http_client = http_client
         self.base_url = "https://api.datadoghq.com"
         self.eu_base_url = "https://api.datadoghq.eu"
         
@@ -57,6 +71,26 @@ class DatadogClient:
             "DD-APPLICATION-KEY": self.app_key,
             "Content-Type": "application/json"
         }
+        
+        # Отправка метрик и событий; точки метрик копятся в буфере и уходят пачкой
+        # (в event loop - из фоновой задачи, в синхронном коде - по размеру или времени)
+        self.enabled = True  # False отключает отправку метрик и событий
+        self._metric_buf: List[Tuple[str, float, float, Tuple[str, ...]]] = []
+        self._metric_flush_size = 100
+        self._metric_flush_interval = 10.0
+        self._last_metric_flush = time.monotonic()
+        self._metric_flush_needed = asyncio.Event()
+        self._metric_drain_task: Optional[asyncio.Task] = None
+        self._pending_sends: set = set()  # события, отправляемые в фоне из event loop
+    
+    @contextlib.asynccontextmanager
+    async def _client(self) -> AsyncIterator[httpx.AsyncClient]:
+        """HTTP клиент для запроса: общий (соединения переиспользуются) или временный"""
+        if self.http_client is not None:
+            yield self.http_client
+        else:
+            async with httpx.AsyncClient() as client:
+                yield client
     
     def _handle_response_error(self, response: httpx.Response, operation: str):
         """Обработка ошибок HTTP ответов"""
@@ -84,7 +118,7 @@ class DatadogClient:
             DatadogAPIError: При других ошибках API
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 # Используем EU endpoint и v1 API для лучшей совместимости
                 response = await client.get(
                     f"{self.eu_base_url}/api/v1/metrics",
@@ -97,9 +131,6 @@ class DatadogClient:
                 
                 raw_data = response.json()
                 
-                # Логируем структуру для отладки
-                log_datadog_response_structure(raw_data, "available metrics")
-                
                 # Используем безопасный парсинг
                 metrics_list = parse_datadog_metrics_list(raw_data)
                 
@@ -144,13 +175,7 @@ class DatadogClient:
         """
         try:
             # Формируем query в правильном формате для v1 API
-            query = f"avg:{metric_name}"
-            if tags:
-                # Добавляем теги в формате {tag1:value1,tag2:value2}
-                tag_string = ",".join(tags)
-                query += f"{{{tag_string}}}"
-            else:
-                query += "{*}"
+            query = _build_query(metric_name, tuple(tags) if tags else None)
             
             # Формируем параметры запроса для v1 API
             params = {
@@ -159,7 +184,7 @@ class DatadogClient:
                 "query": query
             }
             
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.get(
                     f"{self.eu_base_url}/api/v1/query",
                     headers=self.headers,
@@ -170,9 +195,6 @@ class DatadogClient:
                 if response.status_code == 200:
                     raw_data = response.json()
                     
-                    # Логируем структуру для отладки
-                    log_datadog_response_structure(raw_data, f"timeseries {metric_name}")
-                    
                     # Используем безопасный парсинг
                     parsed_data = parse_datadog_timeseries_response(raw_data)
                     
@@ -180,13 +202,14 @@ class DatadogClient:
                         print(f"Ошибка в данных временных рядов: {parsed_data['error']}")
                         return {"error": parsed_data["error"], "series": []}
                     
-                    # Добавляем метаданные запроса
-                    parsed_data.update({
+                    # Добавляем метаданные запроса (parsed_data может быть общим неизменяемым _EMPTY)
+                    parsed_data = {
+                        **parsed_data,
                         "metric_name": metric_name,
                         "start_timestamp": start_timestamp,
                         "end_timestamp": end_timestamp,
                         "query": query
-                    })
+                    }
                     
                     print(f"Получено {len(parsed_data.get('series', []))} серий для метрики {metric_name}")
                     return parsed_data
@@ -198,6 +221,102 @@ class DatadogClient:
         except Exception as e:
             raise DatadogAPIError(f"Ошибка при получении данных метрики {metric_name}: {str(e)}")
     
+    async def get_metrics_timeseries_batch(
+        self,
+        metric_names: List[str],
+        start_timestamp: int,
+        end_timestamp: int
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Получение временных рядов для нескольких метрик одним запросом к v2 API
+        
+        Все запросы упаковываются в одно тело POST /api/v2/query/timeseries,
+        ответ раскладывается обратно по метрикам через индекс именованного запроса
+        
+        Args:
+            metric_names: Имена метрик
+            start_timestamp: Начальный Unix timestamp
+            end_timestamp: Конечный Unix timestamp
+            
+        Returns:
+            Dict[str, Dict[str, Any]]: Данные временных рядов по имени метрики
+            в том же формате, что и get_metric_timeseries; метрики без данных за период
+            возвращаются с пустым списком series
+            
+        Raises:
+            DatadogConnectionError: При ошибках подключения
+            DatadogAuthenticationError: При ошибках аутентификации
+            DatadogAPIError: При других ошибках API
+        """
+        queries = [
+            {
+                "data_source": "metrics",
+                "name": f"m{index}",
+                "query": _build_query(metric_name)
+            }
+            for index, metric_name in enumerate(metric_names)
+        ]
+        
+        body = {
+            "data": {
+                "type": "timeseries_request",
+                "attributes": {
+                    "from": start_timestamp * 1000,
+                    "to": end_timestamp * 1000,
+                    "queries": queries,
+                    "formulas": [{"formula": query["name"]} for query in queries]
+                }
+            }
+        }
+        
+        try:
+            async with self._client() as client:
+                response = await client.post(
+                    f"{self.eu_base_url}/api/v2/query/timeseries",
+                    headers=self.headers,
+                    json=body,
+                    timeout=30.0
+                )
+        except httpx.TimeoutException:
+            raise DatadogConnectionError("Таймаут при пакетном получении данных метрик")
+        
+        if response.status_code != 200:
+            self._handle_response_error(response, "пакетное получение данных метрик")
+        
+        attributes = response.json().get("data", {}).get("attributes", {})
+        times = attributes.get("times") or []
+        values = attributes.get("values") or []
+        
+        results = {
+            metric_name: {
+                "status": "ok",
+                "series": [],
+                "metric_name": metric_name,
+                "start_timestamp": start_timestamp,
+                "end_timestamp": end_timestamp,
+                "query": queries[index]["query"]
+            }
+            for index, metric_name in enumerate(metric_names)
+        }
+        
+        # Серии v2 ссылаются на запрос через query_index - раскладываем их по метрикам
+        for series, series_values in zip(attributes.get("series") or [], values):
+            index = series.get("query_index")
+            if not isinstance(index, int) or not 0 <= index < len(metric_names):
+                continue
+            
+            metric_name = metric_names[index]
+            group_tags = series.get("group_tags") or []
+            results[metric_name]["series"].append(parse_single_series({
+                "metric": metric_name,
+                "scope": ",".join(group_tags) or "*",
+                "pointlist": [[ts, value] for ts, value in zip(times, series_values)],
+                "unit": series.get("unit") or []
+            }).to_dict())
+        
+        print(f"Получено {len(results)} метрик одним запросом к v2 API")
+        return results
+    
     async def get_system_metrics(self, hours_back: int = 1) -> List[Dict[str, Any]]:
         """
         Получение основных системных метрик за указанный период с использованием безопасной итерации
@@ -211,11 +330,11 @@ class DatadogClient:
         """
         try:
             # Вычисляем временные рамки
-            end_time = datetime.now()
-            start_time = end_time - timedelta(hours=hours_back)
-            
-            start_timestamp = int(start_time.timestamp())
-            end_timestamp = int(end_time.timestamp())
+            # Текущее время берем один раз и переиспользуем ISO-строку
+            now = datetime.now()
+            now_iso = now.isoformat()
+            end_timestamp = int(now.timestamp())
+            start_timestamp = end_timestamp - hours_back * 3600
             
             # Полный список системных метрик, организованных по категориям
             metrics_config = {
@@ -253,64 +372,95 @@ class DatadogClient:
             print(f"Получаем данные для системных метрик по категориям: {list(safe_config.keys())}")
             
             metrics_data = []
+            valid_config = {}
             
-            # Получаем данные для каждой категории метрик
+            # Заранее связываем часто используемые в циклах имена
+            _isinstance = isinstance
+            _get_ts = self.get_metric_timeseries
+            
+            # Отбираем корректные категории и имена метрик
             for category, metric_names in safe_config.items():
-                if not isinstance(metric_names, list):
+                if not _isinstance(metric_names, list):
                     print(f"Метрики для категории {category} не являются списком: {type(metric_names)}")
                     continue
-                    
+                
+                valid_names = []
+                append_name = valid_names.append
+                for metric_name in metric_names:
+                    if not _isinstance(metric_name, str):
+                        print(f"Название метрики не является строкой: {type(metric_name)}")
+                        continue
+                    append_name(metric_name)
+                
+                valid_config[category] = valid_names
+            
+            # Получаем все метрики одним запросом; v1 по одной метрике - только если сам пакетный
+            # запрос не удался (метрика без данных в успешном ответе - пустая серия, а не повод для v1)
+            all_metric_names = [name for names in valid_config.values() for name in names]
+            try:
+                batch_results = await self.get_metrics_timeseries_batch(
+                    all_metric_names,
+                    start_timestamp,
+                    end_timestamp
+                )
+            except Exception as e:
+                print(f"Пакетный запрос v2 не удался, используем v1 API: {str(e)}")
+                batch_results = {}
+            _get_batch = batch_results.get
+            
+            # Получаем данные для каждой категории метрик
+            for category, metric_names in valid_config.items():
                 category_data = {
                     "category": category,
                     "metrics": []
                 }
+                append = category_data["metrics"].append
                 
                 for metric_name in metric_names:
-                    if not isinstance(metric_name, str):
-                        print(f"Название метрики не является строкой: {type(metric_name)}")
-                        continue
-                        
-                    try:
-                        metric_data = await self.get_metric_timeseries(
-                            metric_name, 
-                            start_timestamp, 
-                            end_timestamp
-                        )
-                        
-                        # Добавляем метаданные категории
-                        metric_data["category"] = category
-                        metric_data["metric_name"] = metric_name
-                        
-                        category_data["metrics"].append(metric_data)
-                    except Exception as e:
-                        # Логируем ошибку, но продолжаем получать другие метрики
-                        error_msg = f"Не удалось получить метрику {metric_name} из категории {category}: {str(e)}"
-                        print(error_msg)
-                        
-                        # Добавляем информацию об ошибке в результат
-                        error_data = {
-                            "metric_name": metric_name,
-                            "category": category,
-                            "error": error_msg,
-                            "series": []
-                        }
-                        category_data["metrics"].append(error_data)
-                        continue
+                    metric_data = _get_batch(metric_name)
+                    
+                    if metric_data is None:
+                        try:
+                            metric_data = await _get_ts(
+                                metric_name, 
+                                start_timestamp, 
+                                end_timestamp
+                            )
+                        except Exception as e:
+                            # Логируем ошибку, но продолжаем получать другие метрики
+                            error_msg = f"Не удалось получить метрику {metric_name} из категории {category}: {str(e)}"
+                            print(error_msg)
+                            
+                            # Добавляем информацию об ошибке в результат
+                            error_data = {
+                                "metric_name": metric_name,
+                                "category": category,
+                                "error": error_msg,
+                                "series": []
+                            }
+                            append(error_data)
+                            continue
+                    
+                    # Добавляем метаданные категории
+                    metric_data["category"] = category
+                    metric_data["metric_name"] = metric_name
+                    
+                    append(metric_data)
                 
                 # Добавляем категорию с метаданными
                 category_data["metrics_count"] = len(category_data["metrics"])
-                category_data["timestamp"] = end_time.isoformat()
+                category_data["timestamp"] = now_iso
                 metrics_data.append(category_data)
             
             # Добавляем общие метаданные
             result_metadata = {
                 "total_categories": len(metrics_data),
                 "time_range": {
-                    "start": start_time.isoformat(),
-                    "end": end_time.isoformat(),
+                    "start": (now - timedelta(hours=hours_back)).isoformat(),
+                    "end": now_iso,
                     "hours_back": hours_back
                 },
-                "timestamp": datetime.now().isoformat()
+                "timestamp": now_iso
             }
             
             print(f"Обработано {len(metrics_data)} категорий системных метрик")
@@ -340,7 +490,7 @@ class DatadogClient:
             bool: True если подключение успешно, False иначе
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.get(
                     f"{self.eu_base_url}/api/v1/validate",
                     headers=self.headers,
@@ -353,30 +503,144 @@ class DatadogClient:
             return False
 
     def send_metric(self, metric_name: str, value: float, tags: List[str] = None):
-        """Отправляет метрику в Datadog"""
+        """
+        Добавляет точку метрики в буфер
+        
+        В event loop буфер отправляет фоновая задача раз в _metric_flush_interval секунд
+        или сразу при заполнении, остаток - aclose(). Вне event loop буфер отправляется
+        синхронно при заполнении или по истечении интервала, остаток - flush_metrics().
+        """
         if not self.enabled:
             return
-            
+        
+        self._metric_buf.append((metric_name, time.time(), float(value), tuple(tags or ())))
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            if (len(self._metric_buf) >= self._metric_flush_size or
+                    time.monotonic() - self._last_metric_flush >= self._metric_flush_interval):
+                self.flush_metrics()
+            return
+        
+        if len(self._metric_buf) >= self._metric_flush_size:
+            self._metric_flush_needed.set()
+        if self._metric_drain_task is None or self._metric_drain_task.done():
+            self._metric_drain_task = loop.create_task(self._drain_metrics())
+
+    async def _drain_metrics(self):
+        """Фоновая отправка буфера метрик, пока в нем есть точки"""
+        while self._metric_buf:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._metric_flush_needed.wait(), self._metric_flush_interval)
+            self._metric_flush_needed.clear()
+            await self.aflush_metrics()
+
+    def _take_metric_payload(self) -> Optional[Dict[str, Any]]:
+        """Забирает накопленные точки из буфера и группирует их в серии (None - буфер пуст)"""
+        if not self._metric_buf:
+            return None
+        
+        buffered, self._metric_buf = self._metric_buf, []
+        self._last_metric_flush = time.monotonic()
+        
+        # Группируем точки по (метрика, теги) - одна серия на группу
+        series: Dict[Tuple[str, Tuple[str, ...]], List[List[float]]] = {}
+        for metric_name, timestamp, value, tags in buffered:
+            series.setdefault((metric_name, tags), []).append([int(timestamp), value])
+        
+        return {
+            "series": [
+                {"metric": metric_name, "points": points, "tags": list(tags), "type": "gauge"}
+                for (metric_name, tags), points in series.items()
+            ]
+        }
+
+    def _check_send_response(self, response: httpx.Response, operation: str):
+        """Проверка ответа на отправку метрик или события"""
+        if response.status_code not in (200, 202):
+            self._handle_response_error(response, operation)
+
+    def flush_metrics(self):
+        """Синхронно отправляет накопленные точки метрик одним запросом (для кода вне event loop)"""
+        payload = self._take_metric_payload()
+        if payload is None:
+            return
+        
+        try:
+            response = httpx.post(f"{self.eu_base_url}/api/v1/series", headers=self.headers, json=payload, timeout=10.0)
+            self._check_send_response(response, "отправка метрик")
+        except Exception as e:
+            print(f"❌ Ошибка отправки метрик в Datadog: {str(e)}")
+
+    async def aflush_metrics(self):
+        """Отправляет накопленные точки метрик одним запросом через общий HTTP клиент"""
+        payload = self._take_metric_payload()
+        if payload is None:
+            return
+        
         try:
-            api.Metric.send(
-                metric=metric_name,
-                points=[(time.time(), value)],
-                tags=tags or []
-            )
+            async with self._client() as client:
+                response = await client.post(
+                    f"{self.eu_base_url}/api/v1/series",
+                    headers=self.headers,
+                    json=payload,
+                    timeout=10.0
+                )
+            self._check_send_response(response, "отправка метрик")
         except Exception as e:
-            print(f"❌ Ошибка отправки метрики в Datadog: {str(e)}")
+            print(f"❌ Ошибка отправки метрик в Datadog: {str(e)}")
 
     def send_event(self, title: str, text: str, alert_type: str = "info", tags: List[str] = None):
-        """Отправляет событие в Datadog"""
+        """
+        Отправляет событие в Datadog
+        
+        В event loop отправка выполняется фоновой задачей (aclose() дожидается ее),
+        вне event loop - синхронно.
+        """
         if not self.enabled:
             return
-            
+        
+        payload = {
+            "title": title,
+            "text": text,
+            "alert_type": alert_type,
+            "tags": tags or []
+        }
+        
         try:
-            api.Event.create(
-                title=title,
-                text=text,
-                alert_type=alert_type,
-                tags=tags or []
-            )
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            try:
+                response = httpx.post(f"{self.eu_base_url}/api/v1/events", headers=self.headers, json=payload, timeout=10.0)
+                self._check_send_response(response, "отправка события")
+            except Exception as e:
+                print(f"❌ Ошибка отправки события в Datadog: {str(e)}")
+            return
+        
+        task = loop.create_task(self._send_event_async(payload))
+        self._pending_sends.add(task)
+        task.add_done_callback(self._pending_sends.discard)
+
+    async def _send_event_async(self, payload: Dict[str, Any]):
+        """Асинхронная отправка события через общий HTTP клиент"""
+        try:
+            async with self._client() as client:
+                response = await client.post(
+                    f"{self.eu_base_url}/api/v1/events",
+                    headers=self.headers,
+                    json=payload,
+                    timeout=10.0
+                )
+            self._check_send_response(response, "отправка события")
         except Exception as e:
-            print(f"❌ Ошибка отправки события в Datadog: {str(e)}")
\ No newline at end of file
+            print(f"❌ Ошибка отправки события в Datadog: {str(e)}")
+
+    async def aclose(self):
+        """Отправляет оставшиеся метрики и события и завершает фоновые задачи (до закрытия HTTP клиента)"""
+        self._metric_flush_needed.set()
+        if self._metric_drain_task is not None:
+            await self._metric_drain_task
+            self._metric_drain_task = None
+        await self.aflush_metrics()
+        await asyncio.gather(*self._pending_sends, return_exceptions=True)
@@ -3,11 +3,63 @@
 Основаны на реальной структуре ответов API
 """
 
-from typing import Dict, List, Any, Optional, Union
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional, Union
 import logging
 
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba не установлен - используем векторную маску NumPy
+    njit = None
+
 logger = logging.getLogger(__name__)
 
+# Общий неизменяемый результат для ответа без серий - без аллокации на каждый вызов
+_EMPTY: Mapping[str, Any] = MappingProxyType({"series": (), "status": "ok"})
+
+
+@dataclass(slots=True)
+class Series:
+    """
+    Нормализованная серия временного ряда Datadog
+    
+    Для JSON используется to_dict(), а не dataclasses.asdict: asdict копирует
+    массивы NumPy как есть, to_dict собирает из них пары [timestamp, value].
+    """
+    metric: str
+    display_name: str
+    scope: str
+    unit: dict
+    # Точки хранятся двумя массивами (SoA) вместо списка пар [timestamp, value]
+    timestamps: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    values: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float64))
+    interval: int = 0
+    length: int = 0
+    start: Optional[int] = None
+    end: Optional[int] = None
+    aggr: str = "unknown"
+    error: Optional[str] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразование в JSON-совместимый словарь (точки - список пар [timestamp, value])"""
+        return {
+            "metric": self.metric,
+            "display_name": self.display_name,
+            "scope": self.scope,
+            "unit": self.unit,
+            "points": [list(point) for point in zip(self.timestamps.tolist(), self.values.tolist())],
+            "interval": self.interval,
+            "length": self.length,
+            "start": self.start,
+            "end": self.end,
+            "aggr": self.aggr,
+            "error": self.error
+        }
+
+
 def safe_iterate_dict(data: Any, operation_name: str = "неизвестная операция") -> Dict[str, Any]:
     """
     Безопасная итерация по словарю с проверкой типов
@@ -37,7 +89,7 @@ def safe_iterate_dict(data: Any, operation_name: str = "неизвестная 
         logger.debug(f"Значение неожиданного типа: {str(data)[:200]}...")
         return {}
 
-def parse_datadog_timeseries_response(response_data: Dict[str, Any]) -> Dict[str, Any]:
+def parse_datadog_timeseries_response(response_data: Dict[str, Any]) -> Mapping[str, Any]:
     """
     Парсинг ответа временных рядов от Datadog API v1
     
@@ -45,7 +97,8 @@ def parse_datadog_timeseries_response(response_data: Dict[str, Any]) -> Dict[str
         response_data: Сырой ответ от API
         
     Returns:
-        Dict[str, Any]: Нормализованные данные
+        Mapping[str, Any]: Нормализованные данные; серии в формате Series.to_dict
+        (для ответа без серий - общий неизменяемый _EMPTY)
     """
     try:
         # Проверяем базовую структуру ответа
@@ -73,13 +126,16 @@ def parse_datadog_timeseries_response(response_data: Dict[str, Any]) -> Dict[str
             logger.error(f"Поле 'series' не является списком: {type(series_list)}")
             return {"series": [], "error": "Некорректный формат серий данных"}
         
+        if not series_list:
+            return _EMPTY
+        
         formatted_series = []
         for series in series_list:
             if not isinstance(series, dict):
                 logger.warning(f"Серия не является словарем: {type(series)}")
                 continue
                 
-            formatted_series.append(parse_single_series(series))
+            formatted_series.append(parse_single_series(series).to_dict())
         
         return {
             "status": status,
@@ -94,7 +150,7 @@ def parse_datadog_timeseries_response(response_data: Dict[str, Any]) -> Dict[str
         logger.error(f"Ошибка при парсинге ответа Datadog: {str(e)}")
         return {"series": [], "error": f"Ошибка парсинга: {str(e)}"}
 
-def parse_single_series(series_data: Dict[str, Any]) -> Dict[str, Any]:
+def parse_single_series(series_data: Dict[str, Any]) -> Series:
     """
     Парсинг одной серии данных из ответа Datadog
     
@@ -102,7 +158,7 @@ def parse_single_series(series_data: Dict[str, Any]) -> Dict[str, Any]:
         series_data: Данные одной серии
         
     Returns:
-        Dict[str, Any]: Нормализованная серия
+        Series: Нормализованная серия (для JSON используйте Series.to_dict)
     """
     try:
         # Извлекаем основные поля
@@ -113,47 +169,82 @@ def parse_single_series(series_data: Dict[str, Any]) -> Dict[str, Any]:
         # Обрабатываем единицы измерения
         unit_info = extract_unit_info(series_data.get("unit", []))
         
-        # Обрабатываем точки данных
+        # Обрабатываем точки данных: None превращается в NaN и отбрасывается маской
         pointlist = series_data.get("pointlist", [])
-        formatted_points = []
-        
+        pairs = []
         if isinstance(pointlist, list):
-            for point in pointlist:
-                if isinstance(point, list) and len(point) >= 2:
-                    timestamp, value = point[0], point[1]
-                    if timestamp is not None and value is not None:
-                        try:
-                            formatted_points.append([
-                                int(float(timestamp)),  # Конвертируем в int timestamp
-                                float(value)            # Конвертируем в float value
-                            ])
-                        except (ValueError, TypeError) as e:
-                            logger.warning(f"Некорректная точка данных: {point}, ошибка: {e}")
-                            continue
+            pairs = [point[:2] for point in pointlist if isinstance(point, list) and len(point) >= 2]
         
-        return {
-            "metric": metric_name,
-            "display_name": display_name,
-            "scope": scope,
-            "points": formatted_points,
-            "unit": unit_info,
-            "interval": series_data.get("interval", 0),
-            "length": len(formatted_points),
-            "start": series_data.get("start"),
-            "end": series_data.get("end"),
-            "aggr": series_data.get("aggr", "unknown")
-        }
+        points = _coerce_points(pairs)
+        timestamps, values = _filter_points(points[:, 0], points[:, 1])
         
-    except Exception as e:
+        return Series(
+            metric=metric_name,
+            display_name=display_name,
+            scope=scope,
+            unit=unit_info,
+            timestamps=timestamps,
+            values=values,
+            interval=series_data.get("interval", 0),
+            length=len(timestamps),
+            start=series_data.get("start"),
+            end=series_data.get("end"),
+            aggr=series_data.get("aggr", "unknown")
+        )
+        
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
         logger.error(f"Ошибка при парсинге серии: {str(e)}")
-        return {
-            "metric": "error",
-            "display_name": "Ошибка парсинга",
-            "scope": "*",
-            "points": [],
-            "unit": {"name": "unknown", "symbol": ""},
-            "error": str(e)
-        }
+        return Series(
+            metric="error",
+            display_name="Ошибка парсинга",
+            scope="*",
+            unit={"name": "unknown", "symbol": ""},
+            error=str(e)
+        )
+
+def _coerce_points(pairs: List[List[Any]]) -> np.ndarray:
+    """
+    Приведение пар [timestamp, value] к массиву float64 формы (N, 2)
+    
+    Args:
+        pairs: Пары точек из pointlist
+        
+    Returns:
+        np.ndarray: Массив точек; некорректные значения заменены на NaN
+    """
+    try:
+        return np.array(pairs, dtype=np.float64).reshape(-1, 2)
+    except (ValueError, TypeError):
+        pass
+    
+    # Медленный путь: в данных есть значения, которые нельзя привести к числу
+    points = np.full((len(pairs), 2), np.nan)
+    for i, point in enumerate(pairs):
+        try:
+            points[i] = [np.nan if v is None else float(v) for v in point]
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Некорректная точка данных: {point}, ошибка: {e}")
+    return points
+
+if njit is not None:
+    @njit(cache=True)
+    def _filter_points(ts, vals):
+        """Отбрасывает точки с NaN и приводит timestamp к int64 (JIT-ядро Numba)"""
+        n = ts.shape[0]
+        out_ts = np.empty(n, np.int64)
+        out_v = np.empty(n, np.float64)
+        k = 0
+        for i in range(n):
+            if not (np.isnan(ts[i]) or np.isnan(vals[i])):
+                out_ts[k] = np.int64(ts[i])
+                out_v[k] = vals[i]
+                k += 1
+        return out_ts[:k], out_v[:k]
+else:
+    def _filter_points(ts: np.ndarray, vals: np.ndarray):
+        """Отбрасывает точки с NaN и приводит timestamp к int64"""
+        valid = ~(np.isnan(ts) | np.isnan(vals))
+        return ts[valid].astype(np.int64), vals[valid]
 
 def extract_unit_info(unit_data: List[Any]) -> Dict[str, str]:
     """
@@ -277,21 +368,6 @@ def parse_datadog_metrics_list(raw_data: Dict[str, Any]) -> List[Dict[str, Any]]
         print(f"❌ Ошибка парсинга списка метрик: {str(e)}")
         return []
 
-def parse_datadog_timeseries_response(raw_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Парсит ответ временных рядов от Datadog API"""
-    try:
-        if not isinstance(raw_data, dict):
-            return {"error": "Неверный формат данных", "series": []}
-        
-        series = raw_data.get('series', [])
-        if not isinstance(series, list):
-            return {"error": "Отсутствуют данные серий", "series": []}
-        
-        return {"series": series, "status": "ok"}
-    except Exception as e:
-        print(f"❌ Ошибка парсинга временных рядов: {str(e)}")
-        return {"error": str(e), "series": []}
-
 def validate_datadog_response(data: Any, expected_keys: List[str] = None) -> bool:
     """Валидирует ответ от Datadog API"""
     try:
@@ -0,0 +1,208 @@
+"""
+Семантический кэш ответов LLM
+Похожие запросы (по косинусной близости эмбеддингов) обслуживаются без обращения к OpenAI
+
+Кэш создается один раз на процесс (в lifespan приложения) и передается оркестраторам.
+faiss и sentence-transformers - опциональные зависимости (requirements-optional.txt).
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: сохранение на диск отключено
+    fcntl = None
+
+import numpy as np
+import orjson
+
+try:
+    import faiss
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # без faiss/sentence-transformers работает точное совпадение запроса
+    faiss = None
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticLLMCache:
+    """
+    Семантический кэш ответов LLM с интерфейсом get/put
+
+    Кэшировать стоит только ответы, зависящие от одного запроса пользователя:
+    ответы на живые данные (метрики, логи) устаревают.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        max_entries: int = 1024,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        persist_path: Optional[str] = None
+    ):
+        """
+        Args:
+            threshold: Минимальная косинусная близость для попадания в кэш
+            max_entries: Максимальное количество записей (LRU вытеснение)
+            model_name: Модель sentence-transformers для эмбеддингов
+            persist_path: Путь для сохранения индекса на диск (None - только в памяти)
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+
+        # id вектора -> (namespace, ключ, содержимое ответа) в порядке последнего использования
+        self._entries: "OrderedDict[int, Tuple[str, str, str]]" = OrderedDict()
+        self._next_id = 0
+        self._lock = asyncio.Lock()
+        # Сохранения выполняются по одному, чтобы более старый снимок не перезаписал новый
+        self._save_lock = asyncio.Lock()
+        # Воркеры uvicorn делят один файл: пишет только процесс, захвативший блокировку
+        self._writer_lock_file = None
+
+        self._encoder = None
+        self._index = None
+        if SentenceTransformer is not None:
+            self._encoder = SentenceTransformer(model_name)
+            dim = self._encoder.get_sentence_embedding_dimension()
+            self._index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+            self._load()
+            if persist_path:
+                self._acquire_writer()
+
+    async def get(self, key: str, namespace: str = "default") -> Optional[str]:
+        """
+        Поиск ответа для похожего запроса
+
+        Args:
+            key: Текст для семантического поиска (обычно запрос пользователя)
+            namespace: Пространство ключей (например, фаза рассуждения)
+
+        Returns:
+            Сохраненный текст ответа или None
+        """
+        embedding = await self._embed(key)
+        async with self._lock:
+            return self._lookup(namespace, key, embedding)
+
+    async def put(self, key: str, content: str, namespace: str = "default") -> None:
+        """
+        Сохранение ответа LLM
+
+        Args:
+            key: Текст для семантического поиска (обычно запрос пользователя)
+            content: Текст ответа LLM
+            namespace: Пространство ключей (например, фаза рассуждения)
+        """
+        embedding = await self._embed(key)
+        async with self._lock:
+            self._store(namespace, key, embedding, content)
+        if self._writer_lock_file is not None:
+            async with self._save_lock:
+                # Снимок берется под блокировкой: поток сохранения не читает изменяемые записи
+                async with self._lock:
+                    snapshot = self._snapshot()
+                await asyncio.to_thread(self._save, *snapshot)
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Нормализованный эмбеддинг запроса (None без sentence-transformers)"""
+        if self._encoder is None:
+            return None
+        vector = await asyncio.to_thread(
+            self._encoder.encode, [text], normalize_embeddings=True
+        )
+        return np.asarray(vector, dtype=np.float32)
+
+    def _lookup(self, namespace: str, key: str, embedding: Optional[np.ndarray]) -> Optional[str]:
+        """Поиск записи: ближайший сосед по эмбеддингу или точное совпадение ключа"""
+        if embedding is None or self._index.ntotal == 0:
+            for entry_id, (entry_ns, entry_key, content) in self._entries.items():
+                if entry_ns == namespace and entry_key == key:
+                    self._entries.move_to_end(entry_id)
+                    return content
+            return None
+
+        scores, ids = self._index.search(embedding, min(8, self._index.ntotal))
+        for score, entry_id in zip(scores[0], ids[0]):
+            if score < self.threshold:
+                break
+            entry = self._entries.get(int(entry_id))
+            if entry is not None and entry[0] == namespace:
+                self._entries.move_to_end(int(entry_id))
+                return entry[2]
+        return None
+
+    def _store(self, namespace: str, key: str, embedding: Optional[np.ndarray], content: str) -> None:
+        """Добавление записи с вытеснением наименее используемой"""
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (namespace, key, content)
+        if embedding is not None:
+            self._index.add_with_ids(embedding, np.array([entry_id], dtype=np.int64))
+
+        while len(self._entries) > self.max_entries:
+            evicted_id, _ = self._entries.popitem(last=False)
+            if self._index is not None:
+                self._index.remove_ids(np.array([evicted_id], dtype=np.int64))
+
+    def _snapshot(self) -> Tuple[np.ndarray, bytes]:
+        """Сериализованные индекс и записи (вызывается под self._lock)"""
+        index_data = faiss.serialize_index(self._index)
+        entries_data = orjson.dumps([[entry_id, *entry] for entry_id, entry in self._entries.items()])
+        return index_data, entries_data
+
+    def _save(self, index_data: np.ndarray, entries_data: bytes) -> None:
+        """Сохранение снимка индекса и записей на диск (атомарная замена файлов)"""
+        try:
+            for path, data in ((self.persist_path, index_data.tobytes()), (f"{self.persist_path}.entries", entries_data)):
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить кэш LLM: {e}")
+
+    def _acquire_writer(self) -> None:
+        """Захват права записи файла кэша (остальные воркеры только читают его при старте)"""
+        if fcntl is None:
+            return
+        try:
+            lock_file = open(f"{self.persist_path}.lock", "w")
+        except OSError as e:
+            logger.warning(f"Не удалось открыть блокировку кэша LLM: {e}")
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            logger.info("Кэш LLM сохраняет другой воркер, этот процесс работает только в памяти")
+            return
+        self._writer_lock_file = lock_file
+
+    def close(self) -> None:
+        """Освобождение права записи файла кэша"""
+        if self._writer_lock_file is not None:
+            self._writer_lock_file.close()
+            self._writer_lock_file = None
+
+    def _load(self) -> None:
+        """Загрузка индекса и записей с диска"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            index = faiss.read_index(self.persist_path)
+            with open(f"{self.persist_path}.entries", "rb") as f:
+                rows = orjson.loads(f.read())
+        except (OSError, RuntimeError, orjson.JSONDecodeError) as e:
+            logger.warning(f"Не удалось загрузить кэш LLM: {e}")
+            return
+
+        self._index = index
+        for entry_id, namespace, key, content in rows:
+            self._entries[entry_id] = (namespace, key, content)
+        self._next_id = max(self._entries, default=-1) + 1
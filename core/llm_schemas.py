@@ -0,0 +1,74 @@
+"""
+Схемы структурированных ответов LLM (OpenAI Structured Outputs)
+Каждая модель описывает JSON-ответ одной фазы рассуждения
+"""
+
+import functools
+from typing import Any, Dict, List, Literal, Optional, Type
+
+from pydantic import BaseModel, ConfigDict
+
+DataType = Literal["cpu_metrics", "memory_metrics", "disk_metrics", "network_metrics", "error_logs", "performance_logs"]
+Priority = Literal["high", "medium", "low"]
+
+
+class _StrictModel(BaseModel):
+    # strict-режим OpenAI требует additionalProperties: false для каждого объекта
+    model_config = ConfigDict(extra="forbid")
+
+
+class PlanningOut(_StrictModel):
+    """Ответ фазы планирования"""
+    user_intent: Literal["monitoring", "question", "analysis", "other"]
+    analysis_plan: str
+    data_requirements: List[DataType]
+    target_services: List[str]
+    priority: Priority
+
+
+class ExecutionOut(_StrictModel):
+    """Ответ фазы выполнения"""
+    response_type: Literal["monitoring", "answer", "analysis", "explanation"]
+    main_response: str
+    system_status: Optional[Literal["critical", "warning", "ok"]]
+    identified_issues: List[str]
+    analysis_results: str
+    confidence: float
+
+
+class FeedbackOut(_StrictModel):
+    """Ответ фазы обратной связи"""
+    summary: str
+    recommendations: List[str]
+    action_plan: List[str]
+    additional_help: str
+    priority: Priority
+
+
+class DirectOut(_StrictModel):
+    """Прямой ответ без сбора данных"""
+    response_type: Literal["answer", "explanation"]
+    main_response: str
+    recommendations: List[str]
+    confidence: float
+
+
+@functools.lru_cache(maxsize=None)
+def text_format(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Параметр text.format для Responses API со строгой JSON-схемой модели
+
+    Args:
+        model: Pydantic модель ответа
+
+    Returns:
+        Описание формата ответа (вычисляется один раз на модель)
+    """
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": model.__name__,
+            "schema": model.model_json_schema(),
+            "strict": True
+        }
+    }
@@ -1,21 +1,206 @@
+import asyncio
 import uuid
 import time
 import os
-from typing import Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, Type
 from dotenv import load_dotenv
+import ahocorasick
+import httpx
+import orjson
 
 load_dotenv()
 
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
+from openai import AsyncOpenAI, NOT_GIVEN
+from pydantic import BaseModel, ValidationError
 
 from core.reasoning_state import ReasoningState, ReasoningStep, ReasoningPhase
-from core.reasoning_trace import tracer
+from core.llm_cache import SemanticLLMCache
+from core.llm_schemas import PlanningOut, ExecutionOut, FeedbackOut, DirectOut, text_format
 from agents.data_agent import DataAgent
 from agents.protocol_agent import ProtocolAgent
 
 
+# Параметры модели; ключ кэша промпта общий для всех сессий, чтобы статичный
+# системный префикс переиспользовался между запросами
+_MODEL = "gpt-4o"
+_TEMPERATURE = 0.3
+_PROMPT_CACHE_KEY = "bachopus_v1"
+
+def _dumps_pretty(obj: Any) -> str:
+    """Форматированная сериализация в JSON (orjson, UTF-8 без экранирования)"""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _describe_record(record: Any, max_len: int = 300) -> str:
+    """Краткое описание записи DataAgent (метрика, лог или произвольный объект) для промпта LLM"""
+    if isinstance(record, dict):
+        if "metric_name" in record:
+            last_values = [
+                points[-1][1]
+                for series in record.get("series") or ()
+                if isinstance(series, dict) and (points := series.get("points"))
+            ]
+            if last_values:
+                return f"{record['metric_name']}: {', '.join(str(value) for value in last_values)}"
+            if "value" in record and record["value"] is not None:
+                return f"{record['metric_name']}: {record['value']}"
+            return f"{record['metric_name']}: нет точек за период"
+        if "message" in record:
+            return f"{record.get('level', 'INFO')} {record.get('service', 'unknown')}: {str(record['message'])[:max_len]}"
+    return orjson.dumps(record, default=str, option=orjson.OPT_NON_STR_KEYS).decode()[:max_len]
+
+
+# Ключевые слова fallback-планирования по категориям данных
+_REQUIREMENT_KEYWORDS = {
+    "cpu_metrics": ('cpu', 'процессор', 'load', 'нагрузка', 'загружен', 'загрузка'),
+    "memory_metrics": ('memory', 'память', 'ram', 'swap'),
+    "disk_metrics": ('disk', 'диск', 'storage', 'хранилище', 'io'),
+    "network_metrics": ('network', 'сеть', 'traffic', 'трафик', 'connection'),
+    "error_logs": ('error', 'ошибка', 'log', 'лог', 'exception'),
+    "performance_logs": ('performance', 'производительность', 'slow', 'медленно'),
+    # Server load keywords (for "насколько мой сервер загружен?")
+    "server_load": ('сервер', 'server', 'загружен', 'loaded'),
+}
+
+# Категории, которые дополнительно требуют других типов данных
+_CATEGORY_EXPANSIONS = {
+    "performance_logs": ("cpu_metrics", "memory_metrics"),
+    "server_load": ("cpu_metrics", "memory_metrics", "disk_metrics", "network_metrics"),
+}
+
+_DATA_TYPES = ("cpu_metrics", "memory_metrics", "disk_metrics", "network_metrics", "error_logs", "performance_logs")
+
+# Поля анализа выполнения, передаваемые в промпт обратной связи
+_FEEDBACK_FIELDS = frozenset({"response_type", "main_response", "system_status", "identified_issues", "confidence"})
+
+# Keywords that indicate monitoring/system analysis requests
+_MONITORING_KEYWORDS = frozenset({
+    'error', 'errors', 'bug', 'bugs', 'issue', 'issues', 'problem', 'problems',
+    'crash', 'crashes', 'fail', 'failure', 'down', 'outage', 'slow', 'performance',
+    'monitor', 'monitoring', 'status', 'health', 'check', 'analyze', 'analysis',
+    'log', 'logs', 'metric', 'metrics', 'alert', 'alerts', 'warning', 'warnings',
+    'critical', 'service', 'server', 'system', 'api', 'database', 'db'
+})
+
+# Keywords that indicate general questions
+_QUESTION_KEYWORDS = frozenset({
+    'what', 'how', 'why', 'when', 'where', 'who', 'which', 'explain', 'tell me',
+    'help', 'guide', 'tutorial', 'example', 'show', 'demonstrate'
+})
+
+
+# Автомат для поиска ключевых слов fallback-планирования (значение - категории слова)
+_AC = ahocorasick.Automaton()
+for _category, _keywords in _REQUIREMENT_KEYWORDS.items():
+    for _keyword in _keywords:
+        _AC.add_word(_keyword, _AC.get(_keyword, ()) + (_category,))
+_AC.make_automaton()
+
+
+def _classify_requirements(query_lower: str) -> Tuple[str, ...]:
+    """Типы данных, упомянутые в запросе (пустой кортеж - совпадений нет)"""
+    # Один проход автомата Ахо-Корасик вместо отдельного поиска по каждому ключевому слову
+    categories = {category for _, keyword_categories in _AC.iter(query_lower) for category in keyword_categories}
+    for category in tuple(categories):
+        categories.update(_CATEGORY_EXPANSIONS.get(category, ()))
+    return tuple(data_type for data_type in _DATA_TYPES if data_type in categories)
+
+
+def _classify_request_type(query_lower: str) -> str:
+    """Determine the type of user request to provide appropriate response"""
+    # Count monitoring vs question indicators
+    monitoring_score = sum(1 for keyword in _MONITORING_KEYWORDS if keyword in query_lower)
+    question_score = sum(1 for keyword in _QUESTION_KEYWORDS if keyword in query_lower)
+    
+    # Determine request type based on scores and patterns
+    if monitoring_score > question_score and monitoring_score > 0:
+        return "monitoring"
+    elif "?" in query_lower or question_score > 0:
+        return "question"
+    elif any(word in query_lower for word in ['analyze', 'analysis', 'check', 'review']):
+        return "analysis"
+    else:
+        return "other"
+
+
+class _ArrayScanner:
+    """
+    Инкрементальный поиск завершенного JSON-массива по ключу в потоке ответа LLM
+    
+    Текст сканируется один раз: feed() получает только новый фрагмент потока и
+    продолжает разбор с места остановки.
+    """
+    
+    def __init__(self, key: str):
+        self._marker = f'"{key}"'
+        self._tail = ""  # конец текста до маркера (маркер может быть разбит между фрагментами)
+        self._found = False
+        self._chunks: List[str] = []  # полученная часть массива
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.done = False
+    
+    def feed(self, delta: str) -> Optional[List[Any]]:
+        """
+        Обработка очередного фрагмента ответа
+        
+        Args:
+            delta: Новый фрагмент текста
+            
+        Returns:
+            Массив, как только он полностью получен (один раз), иначе None
+        """
+        if self.done:
+            return None
+        
+        if not self._found:
+            text = self._tail + delta
+            found = text.find(self._marker)
+            if found < 0:
+                self._tail = text[-(len(self._marker) - 1):]
+                return None
+            self._found = True
+            self._tail = ""
+            delta = text[found + len(self._marker):]
+        
+        start = 0
+        if self._depth == 0:
+            # Пропуск разделителя между ключом и значением
+            while start < len(delta) and delta[start] in " \t\r\n:":
+                start += 1
+            if start == len(delta):
+                return None
+            if delta[start] != "[":
+                self.done = True
+                return None
+        
+        for i in range(start, len(delta)):
+            char = delta[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "[" or char == "{":
+                self._depth += 1
+            elif char == "]" or char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                    self._chunks.append(delta[start:i + 1])
+                    try:
+                        return orjson.loads("".join(self._chunks))
+                    except orjson.JSONDecodeError:
+                        return None
+        self._chunks.append(delta[start:])
+        return None
+
+
 class AIOrchestrator:
     """
     AI Оркестратор с тремя циклами рассуждения:
@@ -24,23 +209,41 @@ class AIOrchestrator:
     3. Feedback - обратная связь и рекомендации
     """
     
-    def __init__(self, dd_api_key: Optional[str] = None, dd_app_key: Optional[str] = None):
-        # Инициализация LLM
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            temperature=0.3
+    def __init__(self, dd_api_key: Optional[str] = None, dd_app_key: Optional[str] = None, max_parallel: int = 4,
+                 http_client: Optional[httpx.AsyncClient] = None, llm_cache: Optional[SemanticLLMCache] = None):
+        # Общий пул HTTP соединений для OpenAI и Datadog (keep-alive без повторных TLS рукопожатий)
+        self._owns_http = http_client is None
+        self._http = http_client or httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60)
         )
         
+        # Инициализация клиента OpenAI (Responses API)
+        self._oai = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=self._http)
+        
+        # Планы для похожих запросов берутся из семантического кэша (общего для процесса, если передан)
+        self._llm_cache = llm_cache or SemanticLLMCache()
+        
         # Инициализация агентов с ключами Datadog
-        self.data_agent = DataAgent(dd_api_key=dd_api_key, dd_app_key=dd_app_key)
+        self.data_agent = DataAgent(dd_api_key=dd_api_key, dd_app_key=dd_app_key, http_client=self._http)
         self.protocol_agent = ProtocolAgent()
         
-        # Adaptive system prompts for each phase - respond to user intent
-        self.system_prompts = {
-            ReasoningPhase.PLANNING: """You are an intelligent AI assistant that analyzes user requests and creates data collection plans.
+        # Ограничение параллельных запросов к Datadog (защита от rate limiting)
+        self._fetch_semaphore = asyncio.Semaphore(max_parallel)
+        
+        # Единый статичный системный промпт для всех фаз: одинаковый префикс
+        # кэшируется провайдером, изменяемые данные передаются во входе запроса
+        self.system_prompt = """You are Bachopus, an intelligent AI assistant for system monitoring and operations support.
+You work in three phases. Every user message starts with a phase tag: [PHASE: PLANNING], [PHASE: EXECUTION] or [PHASE: FEEDBACK].
+Requests that need no system data are answered in a single step tagged [PHASE: DIRECT].
+Follow ONLY the section of this manual that matches the tag of the current message.
 
 CRITICAL: You MUST respond ONLY with valid JSON format. No additional text, explanations, or formatting.
+Never wrap the JSON in markdown code fences. Never add comments inside the JSON.
+
+=== PHASE: PLANNING ===
+You analyze user requests and create data collection plans.
 
 Your task:
 1. Analyze the user's request to understand their intent
@@ -57,9 +260,30 @@ Required JSON format (respond with this exact structure):
 }
 
 Available data types: cpu_metrics, memory_metrics, disk_metrics, network_metrics, error_logs, performance_logs
+If the request does not need any system data, return an empty data_requirements list.
+
+Example request: "Насколько загружен мой сервер?"
+Example response:
+{
+    "user_intent": "monitoring",
+    "analysis_plan": "Check current CPU and memory utilization of the host",
+    "data_requirements": ["cpu_metrics", "memory_metrics"],
+    "target_services": ["system"],
+    "priority": "medium"
+}
+
+Example request: "Why is the API slow and throwing 500 errors?"
+Example response:
+{
+    "user_intent": "analysis",
+    "analysis_plan": "Correlate error logs and latency with resource usage",
+    "data_requirements": ["error_logs", "performance_logs", "cpu_metrics"],
+    "target_services": ["api"],
+    "priority": "high"
+}
 
-IMPORTANT: Respond ONLY with the JSON structure above. No other text.""",
-            ReasoningPhase.EXECUTION: """You are an intelligent AI assistant focused on providing helpful, accurate responses based on the user's actual needs.
+=== PHASE: EXECUTION ===
+You provide helpful, accurate responses based on the user's actual needs and the collected data.
 
 IMPORTANT: Your response should directly address what the user asked for, not force system monitoring analysis.
 
@@ -77,9 +301,20 @@ Respond in JSON format:
     "identified_issues": ["list_of_issues"] (only if relevant),
     "analysis_results": "detailed analysis relevant to user request",
     "confidence": 0.0-1.0
-}""",
-            
-            ReasoningPhase.FEEDBACK: """You are an intelligent AI assistant providing final recommendations and conclusions based on the user's original request.
+}
+
+Example response for a monitoring request with high CPU usage:
+{
+    "response_type": "monitoring",
+    "main_response": "The server is under heavy load: CPU usage averages 92% over the last hour.",
+    "system_status": "warning",
+    "identified_issues": ["High CPU usage (92% average)"],
+    "analysis_results": "CPU usage stayed above 85% for the whole period while memory usage is stable at 40%.",
+    "confidence": 0.85
+}
+
+=== PHASE: FEEDBACK ===
+You provide final recommendations and conclusions based on the user's original request.
 
 IMPORTANT: Your feedback should be directly useful to what the user actually wanted to know or accomplish.
 
@@ -97,52 +332,46 @@ Respond in JSON format:
     "action_plan": ["specific_steps"] (if applicable),
     "additional_help": "offer of further assistance",
     "priority": "high/medium/low"
-}"""
-        }
+}
+
+Example response for a server with high CPU usage:
+{
+    "summary": "The server is CPU-bound; memory and disk are healthy.",
+    "recommendations": ["Profile the top CPU-consuming processes", "Consider scaling out the service horizontally"],
+    "action_plan": ["Run top or htop to find the heaviest processes", "Review recent deployments for regressions", "Add a CPU usage alert at 85%"],
+    "additional_help": "I can help you set up Datadog monitors for CPU usage.",
+    "priority": "high"
+}
+
+=== PHASE: DIRECT ===
+The request does not need any system data. Answer the user's question directly and completely in one step.
+
+Respond in JSON format:
+{
+    "response_type": "answer/explanation",
+    "main_response": "direct answer to user's question",
+    "recommendations": ["list_of_actionable_recommendations"] (if applicable),
+    "confidence": 0.0-1.0
+}
+
+IMPORTANT: Respond ONLY with the JSON structure of the current phase. No other text."""
+        
+    async def aclose(self) -> None:
+        """Отправка буфера метрик Datadog и закрытие HTTP клиента, если он создан оркестратором"""
+        if self.data_agent.datadog_client is not None:
+            await self.data_agent.datadog_client.aclose()
+        if self._owns_http:
+            await self._http.aclose()
+
+    async def __aenter__(self) -> "AIOrchestrator":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
         
     def _determine_data_requirements_fallback(self, user_query: str, llm_response: str = "") -> dict:
         """Fallback method to determine data requirements based on keywords in user query"""
-        query_lower = user_query.lower()
-        requirements = []
-        
-        # CPU related keywords
-        if any(keyword in query_lower for keyword in ['cpu', 'процессор', 'load', 'нагрузка', 'загружен', 'загрузка']):
-            requirements.append('cpu_metrics')
-            
-        # Memory related keywords  
-        if any(keyword in query_lower for keyword in ['memory', 'память', 'ram', 'swap']):
-            requirements.append('memory_metrics')
-            
-        # Disk related keywords
-        if any(keyword in query_lower for keyword in ['disk', 'диск', 'storage', 'хранилище', 'io']):
-            requirements.append('disk_metrics')
-            
-        # Network related keywords
-        if any(keyword in query_lower for keyword in ['network', 'сеть', 'traffic', 'трафик', 'connection']):
-            requirements.append('network_metrics')
-            
-        # Error/log related keywords
-        if any(keyword in query_lower for keyword in ['error', 'ошибка', 'log', 'лог', 'exception']):
-            requirements.append('error_logs')
-            
-        # Performance related keywords
-        if any(keyword in query_lower for keyword in ['performance', 'производительность', 'slow', 'медленно']):
-            requirements.append('performance_logs')
-            if 'cpu_metrics' not in requirements:
-                requirements.append('cpu_metrics')
-            if 'memory_metrics' not in requirements:
-                requirements.append('memory_metrics')
-        
-        # Server load keywords (for "насколько мой сервер загружен?")
-        if any(keyword in query_lower for keyword in ['сервер', 'server', 'загружен', 'loaded']):
-            if 'cpu_metrics' not in requirements:
-                requirements.append('cpu_metrics')
-            if 'memory_metrics' not in requirements:
-                requirements.append('memory_metrics')
-            if 'disk_metrics' not in requirements:
-                requirements.append('disk_metrics')
-            if 'network_metrics' not in requirements:
-                requirements.append('network_metrics')
+        requirements = list(_classify_requirements(user_query.lower()))
         
         # If no specific requirements found, default to basic monitoring
         if not requirements:
@@ -163,40 +392,16 @@ Respond in JSON format:
 
     def _determine_request_type(self, user_query: str) -> str:
         """Determine the type of user request to provide appropriate response"""
-        query_lower = user_query.lower()
-        
-        # Keywords that indicate monitoring/system analysis requests
-        monitoring_keywords = [
-            'error', 'errors', 'bug', 'bugs', 'issue', 'issues', 'problem', 'problems',
-            'crash', 'crashes', 'fail', 'failure', 'down', 'outage', 'slow', 'performance',
-            'monitor', 'monitoring', 'status', 'health', 'check', 'analyze', 'analysis',
-            'log', 'logs', 'metric', 'metrics', 'alert', 'alerts', 'warning', 'warnings',
-            'critical', 'service', 'server', 'system', 'api', 'database', 'db'
-        ]
-        
-        # Keywords that indicate general questions
-        question_keywords = [
-            'what', 'how', 'why', 'when', 'where', 'who', 'which', 'explain', 'tell me',
-            'help', 'guide', 'tutorial', 'example', 'show', 'demonstrate'
-        ]
-        
-        # Count monitoring vs question indicators
-        monitoring_score = sum(1 for keyword in monitoring_keywords if keyword in query_lower)
-        question_score = sum(1 for keyword in question_keywords if keyword in query_lower)
-        
-        # Determine request type based on scores and patterns
-        if monitoring_score > question_score and monitoring_score > 0:
-            return "monitoring"
-        elif "?" in user_query or question_score > 0:
-            return "question"
-        elif any(word in query_lower for word in ['analyze', 'analysis', 'check', 'review']):
-            return "analysis"
-        else:
-            return "other"
+        return _classify_request_type(user_query.lower())
     
-    async def process_query(self, user_query: str) -> ReasoningState:
+    async def process_query(self, user_query: str, cache_key: Optional[str] = None) -> ReasoningState:
         """
         Основной метод обработки запроса пользователя с трехфазным рассуждением
+        
+        Args:
+            user_query: Запрос пользователя (может включать историю чата)
+            cache_key: Ключ семантического кэша плана - текст нового запроса без истории;
+                None - план не кэшируется (например, при наличии истории чата)
         """
         session_id = str(uuid.uuid4())
         
@@ -204,12 +409,25 @@ Respond in JSON format:
         state = ReasoningState(
             session_id=session_id,
             user_query=user_query,
-            timestamp=datetime.now()
+            plan_cache_key=cache_key
         )
         
         try:
+            # Вопросы без упоминания системных данных обрабатываются одним вызовом LLM
+            state.request_type = self._determine_request_type(user_query)
+            if state.request_type in ("question", "other") and not _classify_requirements(user_query.lower()):
+                await self._direct_answer_phase(state)
+                return state
+            
+            # Спекулятивный сбор данных по ключевым словам, пока LLM строит план
+            speculative_reqs = self._determine_data_requirements_fallback(user_query)["data_requirements"]
+            prefetch_tasks = self._prefetch_data(speculative_reqs)
+            
             # Фаза 1: Планирование
-            await self._planning_phase(state)
+            try:
+                await self._planning_phase(state)
+            finally:
+                await self._collect_prefetched_data(state, prefetch_tasks)
             
             # Фаза 2: Выполнение
             await self._execution_phase(state)
@@ -227,10 +445,200 @@ Respond in JSON format:
             state.add_error(error_msg)
             return state
 
+    async def _fetch_one(self, data_type: str, target_services: Optional[List[str]] = None) -> Any:
+        """
+        Сбор одного типа данных через DataAgent.collect_selective_data
+        
+        Args:
+            data_type: Тип данных из плана (cpu_metrics, error_logs, ...)
+            target_services: Целевые сервисы (используются для service_summary)
+            
+        Returns:
+            Собранные данные или None, если DataAgent не поддерживает этот тип
+            
+        Raises:
+            RuntimeError: Если DataAgent не смог собрать данные
+        """
+        async with self._fetch_semaphore:
+            result = await self.data_agent.collect_selective_data([data_type], target_services)
+        
+        stats = result.get("collection_stats", {})
+        if data_type in stats.get("failed_collections", ()):
+            errors = [err.get("error", "") for err in stats.get("collection_errors", ()) if err.get("type") == data_type]
+            raise RuntimeError("; ".join(errors) or f"Не удалось собрать данные типа {data_type}")
+        return result.get("data", {}).get(data_type)
+
+    def _prefetch_data(self, data_requirements: List[str]) -> Dict[str, asyncio.Task]:
+        """Запуск спекулятивного сбора данных параллельно с фазой планирования"""
+        return {
+            data_type: asyncio.create_task(self._fetch_one(data_type))
+            for data_type in data_requirements
+        }
+
+    async def _collect_prefetched_data(self, state: ReasoningState, prefetch_tasks: Dict[str, asyncio.Task]) -> None:
+        """
+        Согласование спекулятивного сбора с планом: ненужные задачи отменяются,
+        недостающие запускаются, результаты сохраняются в state.raw_data
+        """
+        planned = state.planning_results.get("data_requirements") if isinstance(state.planning_results, dict) else None
+        if not isinstance(planned, list):
+            planned = list(prefetch_tasks)
+        
+        for data_type in prefetch_tasks.keys() - planned:
+            prefetch_tasks[data_type].cancel()
+        
+        tasks = {
+            data_type: prefetch_tasks.get(data_type) or asyncio.create_task(self._fetch_one(data_type))
+            for data_type in planned
+        }
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        
+        failed_types = []
+        for data_type, result in zip(tasks, results):
+            if isinstance(result, BaseException):
+                failed_types.append(data_type)
+            elif result is not None:
+                state.raw_data[data_type] = result
+        
+        # Фаза выполнения не повторяет неудавшиеся попытки сбора
+        state.context["prefetch_failed_types"] = failed_types
+
+    def _format_data_for_llm(self, raw_data: Dict[str, Any], max_records: int = 20) -> str:
+        """
+        Текстовое представление собранных данных для промпта фазы выполнения
+        
+        Args:
+            raw_data: Данные по типам (результат сбора DataAgent)
+            max_records: Максимум записей на тип данных
+            
+        Returns:
+            Компактный текст: по строке на метрику или лог
+        """
+        if not raw_data:
+            return "Данные не собраны"
+        
+        lines = []
+        for data_type, records in raw_data.items():
+            lines.append(f"[{data_type}]")
+            if not isinstance(records, list):
+                lines.append(f"  {_describe_record(records, max_len=2000)}")
+                continue
+            if not records:
+                lines.append("  нет данных")
+                continue
+            lines.extend(f"  • {_describe_record(record)}" for record in records[:max_records])
+            if len(records) > max_records:
+                lines.append(f"  ... и еще {len(records) - max_records}")
+        return "\n".join(lines)
+
+    async def _complete(self, state: ReasoningState, content: str, schema: Type[BaseModel], on_issues=None,
+                        cache_key: Optional[str] = None, namespace: str = "default",
+                        phase: Optional[ReasoningPhase] = None) -> str:
+        """
+        Потоковая генерация ответа LLM через Responses API
+        
+        Фазы одной сессии связываются через previous_response_id: предыдущие ответы
+        хранятся на стороне OpenAI и не отправляются повторно.
+        
+        Args:
+            state: Состояние рассуждения (хранит id последнего ответа)
+            content: Сообщение пользователя для текущей фазы
+            schema: Модель ответа (строгая JSON-схема Structured Outputs)
+            on_issues: Колбэк, вызываемый как только массив identified_issues получен полностью
+            cache_key: Ключ семантического кэша (None - без кэширования)
+            namespace: Пространство ключей кэша
+            phase: Фаза, к которой относится ответ (None - прямой ответ)
+            
+        Returns:
+            Полный текст ответа
+        """
+        if cache_key is not None:
+            cached = await self._llm_cache.get(cache_key, namespace)
+            if cached is not None:
+                return cached
+        
+        stream = await self._oai.responses.create(
+            model=_MODEL,
+            instructions=self.system_prompt,
+            input=content,
+            temperature=_TEMPERATURE,
+            previous_response_id=state.last_response_id or NOT_GIVEN,
+            prompt_cache_key=_PROMPT_CACHE_KEY,
+            # Structured Outputs: ответ гарантированно соответствует схеме фазы
+            text=text_format(schema),
+            stream=True
+        )
+        
+        parts = []
+        scanner = _ArrayScanner("identified_issues") if on_issues else None
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                parts.append(event.delta)
+                if scanner is not None and not scanner.done:
+                    issues = scanner.feed(event.delta)
+                    if issues is not None:
+                        on_issues(issues)
+            elif event.type == "response.completed":
+                state.last_response_id = event.response.id
+                state.last_response_phase = phase
+        
+        response_text = "".join(parts)
+        if cache_key is not None:
+            await self._llm_cache.put(cache_key, response_text, namespace)
+        return response_text
+
+    async def _recommend(self, issues: List[Any]) -> List[str]:
+        """Рекомендации ProtocolAgent по выявленным проблемам (в потоке, параллельно с потоком LLM)"""
+        return await asyncio.to_thread(self.protocol_agent.recommend_for_issues, issues)
+
+    async def _direct_answer_phase(self, state: ReasoningState) -> None:
+        """Прямой ответ на запрос без планирования и сбора данных"""
+        
+        direct_start = time.monotonic_ns()
+        
+        try:
+            response_text = await self._complete(
+                state,
+                f"[PHASE: DIRECT]\nПользователь спрашивает: \"{state.user_query}\"",
+                DirectOut
+            )
+            
+            # Парсинг ответа LLM
+            try:
+                answer = DirectOut.model_validate_json(response_text).model_dump()
+            except ValidationError:
+                # Fallback для отказа модели или неполного ответа
+                answer = {
+                    "response_type": "answer",
+                    "main_response": response_text,
+                    "recommendations": [],
+                    "confidence": 0.5
+                }
+            
+            step = ReasoningStep(
+                phase=ReasoningPhase.EXECUTION,
+                agent_name="DirectAnswerAgent",
+                input_data={"user_query": state.user_query},
+                output_data=answer,
+                reasoning="Answered directly without data collection",
+                confidence=answer.get("confidence", 0.7),
+                execution_time=(time.monotonic_ns() - direct_start) / 1e9
+            )
+            
+            state.add_reasoning_step(step)
+            
+            # Ответ сразу является финальным
+            state.processed_data["final_feedback"] = answer
+            
+        except Exception as e:
+            error_msg = f"Ошибка в фазе прямого ответа: {str(e)}"
+            print(f"❌ {error_msg}")
+            state.add_error(error_msg)
+
     async def _planning_phase(self, state: ReasoningState) -> None:
         """Фаза планирования анализа"""
         
-        planning_start = time.time()
+        planning_start = time.monotonic_ns()
         
         try:
             # Создание промпта для планирования
@@ -241,44 +649,28 @@ Respond in JSON format:
             """
             
             # Вызов LLM для планирования
-            messages = [
-                SystemMessage(content=self.system_prompts[ReasoningPhase.PLANNING]),
-                HumanMessage(content=planning_prompt)
-            ]
-            
-            response = await self.llm.ainvoke(messages)
+            # План зависит только от запроса, поэтому его можно кэшировать (ключ - запрос без истории чата)
+            response_text = await self._complete(
+                state,
+                f"[PHASE: PLANNING]\n{planning_prompt}",
+                PlanningOut,
+                cache_key=state.plan_cache_key,
+                namespace=ReasoningPhase.PLANNING.value,
+                phase=ReasoningPhase.PLANNING
+            )
             
             # Парсинг ответа LLM
             try:
-                response_content = response.content.strip()
-                
-                # Clean up JSON formatting
-                if response_content.startswith("```json"):
-                    response_content = response_content.replace("```json", "").replace("```", "").strip()
-                elif response_content.startswith("```"):
-                    response_content = response_content.replace("```", "").strip()
-                
-                planning_data = json.loads(response_content)
-                
-                # Validate required fields
-                required_fields = ["user_intent", "analysis_plan", "data_requirements", "target_services", "priority"]
-                for field in required_fields:
-                    if field not in planning_data:
-                        raise ValueError(f"Missing required field: {field}")
-                
-            except (json.JSONDecodeError, ValueError) as e:
-                # Enhanced fallback logic
-                planning_data = self._determine_data_requirements_fallback(state.user_query, response.content)
-            
-            except Exception as e:
-                planning_data = self._determine_data_requirements_fallback(state.user_query, "")
-            
-            planning_execution_time = time.time() - planning_start
+                planning_data = PlanningOut.model_validate_json(response_text).model_dump()
+            except ValidationError:
+                # Fallback для отказа модели или неполного ответа
+                planning_data = self._determine_data_requirements_fallback(state.user_query, response_text)
+            
+            planning_execution_time = (time.monotonic_ns() - planning_start) / 1e9
             
             # Создание шага рассуждения
             step = ReasoningStep(
                 phase=ReasoningPhase.PLANNING,
-                timestamp=datetime.now(),
                 agent_name="PlanningAgent",
                 input_data={"user_query": state.user_query},
                 output_data=planning_data,
@@ -315,26 +707,37 @@ Respond in JSON format:
             data_requirements = planning_results.get("data_requirements", ["cpu_metrics", "memory_metrics"])
             target_services = planning_results.get("target_services", ["system"])
             
-            # Сбор данных
-            data_start_time = time.time()
-            raw_data = {}
+            # Сбор данных (часть уже собрана спекулятивно во время планирования)
+            data_start_time = time.monotonic_ns()
+            raw_data = dict(state.raw_data)
+            prefetch_failed_types = set(state.context.get("prefetch_failed_types", ()))
             successful_types = []
             failed_types = []
             
+            pending_types = []
             for data_type in data_requirements:
-                try:
-                    if data_type in ["cpu_metrics", "memory_metrics", "disk_metrics", "network_metrics"]:
-                        data = await self.data_agent.collect_system_metrics(data_type)
-                        raw_data[data_type] = data
-                        successful_types.append(data_type)
-                    elif data_type in ["error_logs", "performance_logs"]:
-                        data = await self.data_agent.collect_logs(data_type)
-                        raw_data[data_type] = data
-                        successful_types.append(data_type)
-                except Exception as e:
+                if data_type in raw_data:
+                    successful_types.append(data_type)
+                elif data_type in prefetch_failed_types:
                     failed_types.append(data_type)
+                else:
+                    pending_types.append(data_type)
             
-            data_execution_time = time.time() - data_start_time
+            # Независимые запросы выполняются параллельно (не более max_parallel одновременно)
+            results = await asyncio.gather(
+                *(self._fetch_one(data_type, target_services) for data_type in pending_types),
+                return_exceptions=True
+            )
+            collection_errors = {}
+            for data_type, result in zip(pending_types, results):
+                if isinstance(result, Exception):
+                    failed_types.append(data_type)
+                    collection_errors[data_type] = str(result)
+                elif result is not None:
+                    raw_data[data_type] = result
+                    successful_types.append(data_type)
+            
+            data_execution_time = (time.monotonic_ns() - data_start_time) / 1e9
             
             if failed_types:
                 print(f"⚠️ Сбор данных завершен частично: успешно {len(successful_types)}, ошибок {len(failed_types)}")
@@ -342,7 +745,6 @@ Respond in JSON format:
             # Создание шага сбора данных
             data_step = ReasoningStep(
                 phase=ReasoningPhase.EXECUTION,
-                timestamp=datetime.now(),
                 agent_name="DataAgent",
                 input_data={"data_requirements": data_requirements},
                 output_data=raw_data,
@@ -353,26 +755,8 @@ Respond in JSON format:
             
             state.add_reasoning_step(data_step)
             
-            # Анализ протоколов
-            protocol_start_time = time.time()
-            protocol_analysis = await self.protocol_agent.analyze_protocols(raw_data, analysis_plan)
-            protocol_execution_time = time.time() - protocol_start_time
-            
-            protocol_step = ReasoningStep(
-                phase=ReasoningPhase.EXECUTION,
-                timestamp=datetime.now(),
-                agent_name="ProtocolAgent",
-                input_data={"raw_data": raw_data, "analysis_plan": analysis_plan},
-                output_data=protocol_analysis,
-                reasoning="Analyzed data according to protocols and identified patterns",
-                confidence=0.8,
-                execution_time=protocol_execution_time
-            )
-            
-            state.add_reasoning_step(protocol_step)
-            
             # LLM анализ
-            llm_start_time = time.time()
+            llm_start_time = time.monotonic_ns()
             
             # Подготовка контекста для LLM
             context = f"""
@@ -382,43 +766,74 @@ Respond in JSON format:
             
             Собранные данные:
             {self._format_data_for_llm(raw_data)}
-            
-            Анализ протоколов:
-            {protocol_analysis}
             """
             
-            messages = [
-                SystemMessage(content=self.system_prompts[ReasoningPhase.EXECUTION]),
-                HumanMessage(content=context)
-            ]
+            # Рекомендации запускаются, как только в потоке получен список проблем
+            speculated_issues = []
+            
+            def _start_recommendations(issues: List[Any]) -> None:
+                speculated_issues.extend(issues)
+                state.speculative_recommendations = asyncio.create_task(self._recommend(issues))
+            
+            # Анализ протоколов выполняется в потоке параллельно с LLM анализом;
+            # его результат передается LLM на фазе обратной связи
+            collection_stats = {
+                "requested_types": data_requirements,
+                "successful_collections": successful_types,
+                "failed_collections": failed_types,
+                "collection_errors": [{"type": data_type, "error": collection_errors.get(data_type, "сбор данных не удался")}
+                                      for data_type in failed_types],
+                "has_errors": bool(failed_types)
+            }
+            protocol_start_time = time.monotonic_ns()
             
-            response = await self.llm.ainvoke(messages)
+            async def _analyze_protocols():
+                result = await asyncio.to_thread(self.protocol_agent.analyze_selective_data, raw_data, collection_stats)
+                return result, (time.monotonic_ns() - protocol_start_time) / 1e9
+            
+            # Задача создается непосредственно перед try: finally всегда дожидается ее
+            protocol_task = asyncio.create_task(_analyze_protocols())
+            try:
+                response_text = await self._complete(
+                    state,
+                    f"[PHASE: EXECUTION]\n{context}",
+                    ExecutionOut,
+                    on_issues=_start_recommendations,
+                    phase=ReasoningPhase.EXECUTION
+                )
+            finally:
+                protocol_analysis, protocol_execution_time = await protocol_task
+            
+            protocol_step = ReasoningStep(
+                phase=ReasoningPhase.EXECUTION,
+                agent_name="ProtocolAgent",
+                input_data={"raw_data": raw_data, "analysis_plan": analysis_plan},
+                output_data=protocol_analysis,
+                reasoning="Analyzed data according to protocols and identified patterns",
+                confidence=0.8,
+                execution_time=protocol_execution_time
+            )
+            
+            state.add_reasoning_step(protocol_step)
             
             # Парсинг ответа LLM
             try:
-                response_content = response.content.strip()
-                if response_content.startswith("```json"):
-                    response_content = response_content.replace("```json", "").replace("```", "").strip()
-                elif response_content.startswith("```"):
-                    response_content = response_content.replace("```", "").strip()
-                
-                llm_analysis = json.loads(response_content)
-            except (json.JSONDecodeError, ValueError):
-                # Fallback для некорректного JSON
+                llm_analysis = ExecutionOut.model_validate_json(response_text).model_dump()
+            except ValidationError:
+                # Fallback для отказа модели или неполного ответа
                 llm_analysis = {
                     "response_type": "analysis",
-                    "main_response": response.content,
+                    "main_response": response_text,
                     "system_status": "unknown",
                     "identified_issues": [],
-                    "analysis_results": response.content,
+                    "analysis_results": response_text,
                     "confidence": 0.5
                 }
             
-            llm_execution_time = time.time() - llm_start_time
+            llm_execution_time = (time.monotonic_ns() - llm_start_time) / 1e9
             
             llm_step = ReasoningStep(
                 phase=ReasoningPhase.EXECUTION,
-                timestamp=datetime.now(),
                 agent_name="LLMAnalyst",
                 input_data={"context": context},
                 output_data=llm_analysis,
@@ -438,6 +853,11 @@ Respond in JSON format:
             
             # Извлечение проблем из анализа
             identified_issues = llm_analysis.get("identified_issues", [])
+            
+            # Спекулятивные рекомендации действительны только для итогового списка проблем
+            if state.speculative_recommendations is not None and identified_issues != speculated_issues:
+                state.speculative_recommendations.cancel()
+                state.speculative_recommendations = None
             if identified_issues:
                 state.identified_issues.extend(identified_issues)
             
@@ -453,75 +873,96 @@ Respond in JSON format:
             # Получение результатов выполнения
             execution_results = state.processed_data.get("execution", {})
             
-            # Анализ протоколов для рекомендаций
-            protocol_start_time = time.time()
-            recommendations = await self.protocol_agent.generate_recommendations(
-                execution_results.get("raw_data", {}),
-                state.identified_issues
-            )
-            protocol_execution_time = time.time() - protocol_start_time
+            # Без выявленных проблем вне мониторинга ответ фазы выполнения уже финальный
+            if not state.identified_issues and state.request_type != "monitoring":
+                if state.speculative_recommendations is not None:
+                    state.speculative_recommendations.cancel()
+                state.processed_data["final_feedback"] = {
+                    "summary": execution_results.get("llm_analysis", {}).get("main_response", ""),
+                    "recommendations": [],
+                    "action_plan": [],
+                    "priority": "low"
+                }
+                state.phases_skipped += 1
+                return
             
-            protocol_step = ReasoningStep(
-                phase=ReasoningPhase.FEEDBACK,
-                timestamp=datetime.now(),
-                agent_name="ProtocolAgent",
-                input_data={"execution_results": execution_results, "issues": state.identified_issues},
-                output_data=recommendations,
-                reasoning="Generated recommendations based on identified issues",
-                confidence=0.8,
-                execution_time=protocol_execution_time
-            )
+            # Рекомендации протоколов готовятся параллельно с LLM и объединяются с ее рекомендациями
+            protocol_start_time = time.monotonic_ns()
             
-            state.add_reasoning_step(protocol_step)
+            async def _protocol_recommendations():
+                if state.speculative_recommendations is not None:
+                    result = await state.speculative_recommendations
+                else:
+                    result = await self._recommend(state.identified_issues)
+                return result, (time.monotonic_ns() - protocol_start_time) / 1e9
             
-            # LLM для финальной обратной связи
-            feedback_start_time = time.time()
+            recommendations_task = asyncio.create_task(_protocol_recommendations())
             
-            # Подготовка контекста для финальной обратной связи
+            # LLM для финальной обратной связи
+            feedback_start_time = time.monotonic_ns()
+            
+            # Подготовка контекста для финальной обратной связи (только поля, нужные для рекомендаций);
+            # если цепочка продолжается от ответа фазы выполнения, анализ уже есть в контексте
+            # беседы на стороне OpenAI (при сбое потока выполнения последний ответ - от планирования)
+            llm_analysis = execution_results.get("llm_analysis", {})
+            if state.last_response_id and state.last_response_phase is ReasoningPhase.EXECUTION:
+                analysis_summary = "(см. предыдущий ответ)"
+            else:
+                analysis_summary = _dumps_pretty({k: v for k, v in llm_analysis.items() if k in _FEEDBACK_FIELDS})
             context = f"""
             Пользователь спрашивает: "{state.user_query}"
             
             Результаты анализа:
-            {json.dumps(execution_results.get("llm_analysis", {}), indent=2, ensure_ascii=False)}
+            {analysis_summary}
             
-            Выявленные проблемы:
-            {json.dumps(state.identified_issues, indent=2, ensure_ascii=False)}
+            Анализ протоколов:
+            {execution_results.get("protocol_analysis", {})}
             
-            Рекомендации протоколов:
-            {json.dumps(recommendations, indent=2, ensure_ascii=False)}
+            Выявленные проблемы:
+            {_dumps_pretty(state.identified_issues)}
             """
             
-            messages = [
-                SystemMessage(content=self.system_prompts[ReasoningPhase.FEEDBACK]),
-                HumanMessage(content=context)
-            ]
+            try:
+                response_text = await self._complete(
+                    state, f"[PHASE: FEEDBACK]\n{context}", FeedbackOut, phase=ReasoningPhase.FEEDBACK
+                )
+            finally:
+                recommendations, protocol_execution_time = await recommendations_task
             
-            response = await self.llm.ainvoke(messages)
+            protocol_step = ReasoningStep(
+                phase=ReasoningPhase.FEEDBACK,
+                agent_name="ProtocolAgent",
+                input_data={"execution_results": execution_results, "issues": state.identified_issues},
+                output_data=recommendations,
+                reasoning="Generated recommendations based on identified issues",
+                confidence=0.8,
+                execution_time=protocol_execution_time
+            )
+            
+            state.add_reasoning_step(protocol_step)
             
             # Парсинг ответа LLM
             try:
-                response_content = response.content.strip()
-                if response_content.startswith("```json"):
-                    response_content = response_content.replace("```json", "").replace("```", "").strip()
-                elif response_content.startswith("```"):
-                    response_content = response_content.replace("```", "").strip()
-                
-                feedback_data = json.loads(response_content)
-            except (json.JSONDecodeError, ValueError):
-                # Fallback для некорректного JSON
+                feedback_data = FeedbackOut.model_validate_json(response_text).model_dump()
+            except ValidationError:
+                # Fallback для отказа модели или неполного ответа
                 feedback_data = {
-                    "summary": response.content,
+                    "summary": response_text,
                     "recommendations": [],
                     "action_plan": [],
                     "additional_help": "Обратитесь за дополнительной помощью",
                     "priority": "medium"
                 }
             
-            feedback_execution_time = time.time() - feedback_start_time
+            # Объединение рекомендаций LLM и протоколов без дубликатов с сохранением порядка;
+            # протоколы добавляют только рекомендации по распознанным проблемам
+            if recommendations:
+                feedback_data["recommendations"] = list(dict.fromkeys([*feedback_data.get("recommendations", []), *recommendations]))
+            
+            feedback_execution_time = (time.monotonic_ns() - feedback_start_time) / 1e9
             
             feedback_step = ReasoningStep(
                 phase=ReasoningPhase.FEEDBACK,
-                timestamp=datetime.now(),
                 agent_name="FeedbackAgent",
                 input_data={"context": context},
                 output_data=feedback_data,
@@ -559,5 +1000,5 @@ Respond in JSON format:
             "identified_issues": state.identified_issues,
             "recommendations": state.recommendations,
             "action_plan": state.action_plan,
-            "reasoning_trace": [step.to_dict() for step in state.reasoning_steps]
+            "reasoning_trace": orjson.loads(state.reasoning_steps_json())
         }
\ No newline at end of file
@@ -1,8 +1,17 @@
+import asyncio
+import time
+from collections import defaultdict
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from dataclasses import dataclass, field
+from functools import cached_property
 from enum import Enum
 
+import orjson
+
+# Опции сериализации шагов: данные агентов могут содержать numpy-массивы и нестроковые ключи
+_STEP_DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
 
 class ReasoningPhase(Enum):
     """Фазы рассуждения оркестратора"""
@@ -15,13 +24,19 @@ class ReasoningPhase(Enum):
 class ReasoningStep:
     """Отдельный шаг рассуждения"""
     phase: ReasoningPhase
-    timestamp: datetime
     agent_name: str
     input_data: Dict[str, Any]
     output_data: Dict[str, Any]
     reasoning: str
     confidence: float
     execution_time: float
+    # Время создания в наносекундах; datetime строится только при обращении к timestamp
+    created_ns: int = field(default_factory=time.time_ns)
+    
+    @cached_property
+    def timestamp(self) -> datetime:
+        """Время создания шага"""
+        return datetime.fromtimestamp(self.created_ns / 1e9)
     
     def to_dict(self) -> Dict[str, Any]:
         """Преобразование в словарь для логирования"""
@@ -46,9 +61,16 @@ class ReasoningState:
     user_query: str
     current_phase: ReasoningPhase = ReasoningPhase.PLANNING
     request_type: str = "other"  # Type of user request: monitoring/question/analysis/other
+    plan_cache_key: Optional[str] = None  # Ключ семантического кэша плана (None - без кэширования)
+    
+    # История шагов рассуждения (сериализуется только при выдаче: to_dict / reasoning_steps_json)
+    reasoning_steps: List[ReasoningStep] = field(default_factory=list, repr=False)
     
-    # История шагов рассуждения
-    reasoning_steps: List[ReasoningStep] = field(default_factory=list)
+    # Накопленные суммы для статистики без повторного прохода по шагам
+    _confidence_sum: float = field(default=0.0, init=False, repr=False)
+    _phase_counts: Dict[ReasoningPhase, int] = field(default_factory=lambda: defaultdict(int), init=False, repr=False)
+    _phase_confidence_sums: Dict[ReasoningPhase, float] = field(default_factory=lambda: defaultdict(float), init=False, repr=False)
+    _phase_time_sums: Dict[ReasoningPhase, float] = field(default_factory=lambda: defaultdict(float), init=False, repr=False)
     
     # Контекст данных
     context: Dict[str, Any] = field(default_factory=dict)  # Add context field
@@ -62,10 +84,16 @@ class ReasoningState:
     recommendations: List[Dict[str, Any]] = field(default_factory=list)
     action_plan: List[Dict[str, Any]] = field(default_factory=list)
     
+    # Рекомендации, запущенные спекулятивно во время потоковой генерации анализа
+    speculative_recommendations: Optional[asyncio.Task] = field(default=None, repr=False)
+    
     # Метаданные
     start_time: datetime = field(default_factory=datetime.now)
     last_update: datetime = field(default_factory=datetime.now)
     total_confidence: float = 0.0
+    last_response_id: Optional[str] = None  # id последнего ответа OpenAI Responses API
+    last_response_phase: Optional[ReasoningPhase] = None  # фаза, в которой получен last_response_id
+    phases_skipped: int = 0  # Фазы, пропущенные как ненужные для запроса
     
     # Флаги состояния
     is_complete: bool = False
@@ -77,9 +105,17 @@ class ReasoningState:
         self.reasoning_steps.append(step)
         self.last_update = datetime.now()
         
+        self._phase_counts[step.phase] += 1
+        self._phase_confidence_sums[step.phase] += step.confidence
+        self._phase_time_sums[step.phase] += step.execution_time
+        
         # Обновить общую уверенность
-        if self.reasoning_steps:
-            self.total_confidence = sum(s.confidence for s in self.reasoning_steps) / len(self.reasoning_steps)
+        self._confidence_sum += step.confidence
+        self.total_confidence = self._confidence_sum / len(self.reasoning_steps)
+    
+    def reasoning_steps_json(self) -> bytes:
+        """История шагов рассуждения как JSON-массив (данные агентов приводятся к JSON-типам)"""
+        return orjson.dumps([step.to_dict() for step in self.reasoning_steps], default=str, option=_STEP_DUMPS_OPTIONS)
     
     def set_phase(self, phase: ReasoningPhase):
         """Установить текущую фазу"""
@@ -106,11 +142,11 @@ class ReasoningState:
         
         phase_stats = {}
         for phase in ReasoningPhase:
-            phase_steps = self.get_phase_steps(phase)
+            steps_count = self._phase_counts.get(phase, 0)
             phase_stats[phase.value] = {
-                "steps_count": len(phase_steps),
-                "avg_confidence": sum(s.confidence for s in phase_steps) / len(phase_steps) if phase_steps else 0,
-                "total_time": sum(s.execution_time for s in phase_steps)
+                "steps_count": steps_count,
+                "avg_confidence": self._phase_confidence_sums[phase] / steps_count if steps_count else 0,
+                "total_time": self._phase_time_sums.get(phase, 0)
             }
         
         return {
@@ -122,6 +158,7 @@ class ReasoningState:
             "is_complete": self.is_complete,
             "has_errors": self.has_errors,
             "error_count": len(self.error_messages),
+            "phases_skipped": self.phases_skipped,
             "phase_statistics": phase_stats,
             "issues_found": len(self.identified_issues),
             "recommendations_generated": len(self.recommendations),
@@ -134,7 +171,7 @@ class ReasoningState:
             "session_id": self.session_id,
             "user_query": self.user_query,
             "current_phase": self.current_phase.value,
-            "reasoning_steps": [step.to_dict() for step in self.reasoning_steps],
+            "reasoning_steps": orjson.loads(self.reasoning_steps_json()),
             "raw_data": self.raw_data,
             "processed_data": self.processed_data,
             "identified_issues": self.identified_issues,
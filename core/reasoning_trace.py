@@ -1,28 +1,169 @@
-import json
+import atexit
+import itertools
 import logging
-from typing import Dict, Any, Optional
+import math
+import queue
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, List, Optional
 from colorama import Fore, Back, Style, init
-from .reasoning_state import ReasoningState, ReasoningStep, ReasoningPhase
+from .reasoning_state import ReasoningState, ReasoningPhase
 
-# Инициализация colorama для Windows
-init(autoreset=True)
+try:
+    import numpy as np
+except ImportError:  # без numpy время шагов хранится списком
+    np = None
+
+# Инициализация colorama нужна только консоли Windows: терминалы POSIX понимают ANSI сами
+if sys.platform == 'win32':
+    init(autoreset=True)
+
+
+def _bright(color: str) -> str:
+    """Цвет и яркость одной SGR-последовательностью (\x1b[1;36m вместо \x1b[1m\x1b[36m)"""
+    return f"\x1b[1;{color[2:-1]}m"
+
+
+_BRIGHT_RED = _bright(Fore.RED)
+_BRIGHT_GREEN = _bright(Fore.GREEN)
+_BRIGHT_CYAN = _bright(Fore.CYAN)
+
+
+def _context_lines(value: Any, indent: int, lines: List[str]):
+    """Рекурсивное добавление строк "ключ: значение" для вложенных словарей и списков"""
+    pad = "  " * indent
+    if isinstance(value, dict):
+        for key in sorted(value, key=str):
+            item = value[key]
+            if item and isinstance(item, (dict, list, tuple)):
+                lines.append(f"{pad}{key}:")
+                _context_lines(item, indent + 1, lines)
+            else:
+                lines.append(f"{pad}{key}: {item!r}")
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            if item and isinstance(item, (dict, list, tuple)):
+                lines.append(f"{pad}-")
+                _context_lines(item, indent + 1, lines)
+            else:
+                lines.append(f"{pad}- {item!r}")
+    else:
+        lines.append(f"{pad}{value!r}")
+
+
+def _format_context(ctx: Any, indent: int = 0) -> str:
+    """Человекочитаемое представление контекста для вывода в рамке (без сериализации в JSON)"""
+    lines: List[str] = []
+    _context_lines(ctx, indent, lines)
+    return "\n".join(lines)
+
+
+def _count_logs(value: Any) -> str:
+    return f"{len(value) if isinstance(value, list) else 1} логов"
+
+
+def _count_datadog_metrics(value: Any) -> str:
+    # Метаданные пропускаются, категории метрик раскрываются в количество метрик внутри
+    if isinstance(value, list):
+        count = sum(
+            (0 if "_metadata" in item else len(item["metrics"]) if isinstance(item.get("metrics"), list) else 1)
+            if isinstance(item, dict) else 1
+            for item in value
+        )
+    else:
+        count = 1
+    return f"{count} метрик"
+
+
+def _count_critical_errors(value: Any) -> str:
+    return f"{len(value) if isinstance(value, list) else 1} критических ошибок"
+
+
+def _count_service(value: Any) -> str:
+    if isinstance(value, dict):
+        return f"сводка сервиса {value.get('service', 'неизвестный')}"
+    return "сводка сервиса"
+
+
+# Цвета и символы для проблем, рекомендаций и плана действий
+_SEVERITY_COLOR = {
+    'CRITICAL': Fore.RED,
+    'HIGH': Fore.YELLOW,
+    'MEDIUM': Fore.BLUE,
+    'LOW': Fore.GREEN
+}
+
+_PRIORITY_COLOR = {
+    'HIGH': Fore.RED,
+    'MEDIUM': Fore.YELLOW,
+    'LOW': Fore.GREEN
+}
+
+_STATUS_SYMBOL = {
+    'pending': '⏳',
+    'in_progress': '🔄',
+    'completed': '✅',
+    'failed': '❌'
+}
+
+# Шаблон сводки сессии (поля из ReasoningState.get_execution_summary)
+_SESSION_SUMMARY_TMPL = (
+    "Total Time: {total_execution_time:.2f}s\n"
+    "Total Steps: {total_steps}\n"
+    "Overall Confidence: {overall_confidence:.1%}\n"
+    "Issues Found: {issues_found}\n"
+    "Recommendations: {recommendations_generated}\n"
+    "Action Items: {action_items}\n"
+    "Errors: {error_count}"
+)
+
+# Ключ собранных данных -> функция краткого описания (в порядке вывода)
+_COUNTERS = {
+    "logs": _count_logs,
+    "metrics": _count_datadog_metrics,
+    "critical_errors": _count_critical_errors,
+    "service_summary": _count_service
+}
+
+
+@dataclass(slots=True)
+class TraceStep:
+    """Шаг, записанный трассировщиком через trace_reasoning_step"""
+    step_name: str
+    input_data: Any
+    output_data: Any
+    execution_time: Optional[float] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
 
 
 class ReasoningTracer:
     """Система трассировки рассуждений с цветным логированием в консоль"""
     
+    # Консольный поток и фоновый обработчик настраиваются один раз на процесс
+    _stream_configured = False
+    _listener: Optional[QueueListener] = None
+    
     def __init__(self, log_level: str = "INFO"):
         self.logger = logging.getLogger("ReasoningTracer")
+        self.session_id = str(uuid.uuid4())
+        self.created_at = datetime.now()
+        
+        # Записанные шаги и их время выполнения отдельным плоским списком для быстрого суммирования
+        self.steps: List[TraceStep] = []
+        self._exec_times = np.zeros(64, dtype=np.float64) if np is not None else []
+        self._n = 0
         self.logger.setLevel(getattr(logging, log_level.upper()))
         
         # Настройка консольного обработчика
-        if not self.logger.handlers:
+        if not ReasoningTracer._stream_configured and not self.logger.handlers:
             console_handler = logging.StreamHandler()
             console_handler.setLevel(getattr(logging, log_level.upper()))
             
             # Настройка кодировки для Windows
-            import sys
             if hasattr(console_handler.stream, 'reconfigure'):
                 console_handler.stream.reconfigure(encoding='utf-8')
             elif sys.platform.startswith('win'):
@@ -33,7 +174,14 @@ class ReasoningTracer:
             formatter = logging.Formatter('%(message)s')
             console_handler.setFormatter(formatter)
             
-            self.logger.addHandler(console_handler)
+            # Запись в консоль выполняется фоновым потоком: вызывающий код только кладет запись в очередь
+            log_queue = queue.Queue(-1)
+            self.logger.addHandler(QueueHandler(log_queue))
+            listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)
+            ReasoningTracer._listener = listener
+        ReasoningTracer._stream_configured = True
         
         # Цветовая схема для разных фаз
         self.phase_colors = {
@@ -55,6 +203,19 @@ class ReasoningTracer:
             "recommendation": "💡",
             "action": "🎯"
         }
+        
+        # Предвычисленные ANSI-префиксы: строки не собираются заново на каждую запись
+        self._reset = Style.RESET_ALL
+        self._phase_prefix = {phase: _bright(color) for phase, color in self.phase_colors.items()}
+        self._default_prefix = _bright(Fore.WHITE)
+        self._error_prefix = f"\n{Fore.RED}["
+        self._warning_prefix = f"{Fore.YELLOW}["
+        self._info_prefix = f"{Fore.BLUE}["
+        self._sep_line: Dict[tuple, str] = {}
+        
+        # Кэш "HH:MM:SS" для текущей секунды
+        self._ts_second = -1
+        self._ts_prefix = ""
     
     def _get_phase_color(self, phase: ReasoningPhase) -> str:
         """Получить цвет для фазы"""
@@ -62,38 +223,64 @@ class ReasoningTracer:
     
     def _format_timestamp(self) -> str:
         """Форматировать временную метку"""
-        return datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        t = time.time()
+        second = int(t)
+        if second != self._ts_second:
+            lt = time.localtime(second)
+            self._ts_prefix = f"{lt.tm_hour:02d}:{lt.tm_min:02d}:{lt.tm_sec:02d}"
+            self._ts_second = second
+        return f"{self._ts_prefix}.{int((t - second) * 1000):03d}"
+    
+    def _separator_line(self, char: str = "─", length: int = 80, color: str = Fore.WHITE) -> str:
+        """Строка разделителя (собирается один раз на сочетание параметров)"""
+        key = (char, length, color)
+        line = self._sep_line.get(key)
+        if line is None:
+            line = self._sep_line[key] = f"{color}{char * length}{self._reset}"
+        return line
     
     def _print_separator(self, char: str = "─", length: int = 80, color: str = Fore.WHITE):
         """Печать разделителя"""
-        self.logger.info(f"{color}{char * length}{Style.RESET_ALL}")
+        self.logger.info(self._separator_line(char, length, color))
     
-    def _print_box(self, title: str, content: str, color: str = Fore.WHITE):
-        """Печать содержимого в рамке"""
+    def _box_lines(self, title: str, content: str, color: str = Fore.WHITE) -> List[str]:
+        """Строки рамки с содержимым"""
+        # Длина каждой строки вычисляется один раз, ширина - одной редукцией вместе с заголовком
         lines = content.split('\n')
-        max_width = max(len(title), max(len(line) for line in lines)) + 4
+        widths = list(map(len, lines))
+        max_width = max(itertools.chain((len(title),), widths)) + 4
+        border = '─' * (max_width - 2)
+        
+        parts = []
         
         # Верхняя граница
-        self.logger.info(f"{color}┌{'─' * (max_width - 2)}┐{Style.RESET_ALL}")
+        # Цвет задается один раз в начале рамки и сбрасывается один раз в конце
+        parts.append(f"{color}┌{border}┐")
         
         # Заголовок
         title_padding = max_width - len(title) - 4
-        self.logger.info(f"{color}│ {Style.BRIGHT}{title}{Style.NORMAL}{' ' * title_padding} │{Style.RESET_ALL}")
+        parts.append(f"│ {Style.BRIGHT}{title}{Style.NORMAL}{' ' * title_padding} │")
         
         # Разделитель
-        self.logger.info(f"{color}├{'─' * (max_width - 2)}┤{Style.RESET_ALL}")
+        parts.append(f"├{border}┤")
         
         # Содержимое
-        for line in lines:
-            line_padding = max_width - len(line) - 4
-            self.logger.info(f"{color}│ {line}{' ' * line_padding} │{Style.RESET_ALL}")
+        for line, width in zip(lines, widths):
+            parts.append(f"│ {line}{' ' * (max_width - width - 4)} │")
         
         # Нижняя граница
-        self.logger.info(f"{color}└{'─' * (max_width - 2)}┘{Style.RESET_ALL}")
+        parts.append(f"└{border}┘{Style.RESET_ALL}")
+        
+        return parts
+    
+    def _print_box(self, title: str, content: str, color: str = Fore.WHITE):
+        """Печать содержимого в рамке (одной записью лога)"""
+        self.logger.info("\n".join(self._box_lines(title, content, color)))
     
     def trace_session_start(self, state: ReasoningState):
         """Трассировка начала сессии"""
-        self._print_separator("═", color=Fore.MAGENTA)
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
         
         header = f"{self.symbols['start']} AI ORCHESTRATOR SESSION STARTED"
         session_info = f"""Session ID: {state.session_id}
@@ -101,25 +288,30 @@ Query: {state.user_query}
 Start Time: {state.start_time.strftime('%Y-%m-%d %H:%M:%S')}
 Initial Phase: {state.current_phase.value.upper()}"""
         
-        self._print_box(header, session_info, Fore.MAGENTA)
-        self._print_separator("═", color=Fore.MAGENTA)
+        # Разделители и рамка выводятся одной записью
+        separator = self._separator_line("═", color=Fore.MAGENTA)
+        self.logger.info("\n".join([separator, *self._box_lines(header, session_info, Fore.MAGENTA), separator]))
     
     def trace_phase_start(self, phase: ReasoningPhase, context: Dict[str, Any] = None):
         """Трассировка начала фазы"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
         color = self._get_phase_color(phase)
+        prefix = self._phase_prefix.get(phase, self._default_prefix)
         timestamp = self._format_timestamp()
         
-        self.logger.info(f"\n{color}{Style.BRIGHT}[{timestamp}] 🔄 PHASE: {phase.value.upper()} STARTED{Style.RESET_ALL}")
+        self.logger.info(f"\n{prefix}[{timestamp}] 🔄 PHASE: {phase.value.upper()} STARTED{self._reset}")
         
         if context:
-            context_str = json.dumps(context, indent=2, ensure_ascii=False)
+            context_str = _format_context(context)
             self._print_box("Phase Context", context_str, color)
     
     def trace_reasoning_step(self, step_name: str, input_data: Any, output_data: Any, 
                            execution_time: float = None, metadata: Dict[str, Any] = None):
         """Записывает шаг рассуждения"""
         try:
-            step = ReasoningStep(
+            step = TraceStep(
                 step_name=step_name,
                 input_data=input_data,
                 output_data=output_data,
@@ -127,14 +319,28 @@ Initial Phase: {state.current_phase.value.upper()}"""
                 metadata=metadata or {}
             )
             self.steps.append(step)
+            self._record_exec_time(execution_time or 0.0)
             
         except Exception as e:
             print(f"❌ Ошибка записи шага рассуждения: {str(e)}")
 
+    def _record_exec_time(self, execution_time: float):
+        """Добавить время шага (массив numpy растет удвоением)"""
+        if np is None:
+            self._exec_times.append(execution_time)
+        else:
+            if self._n == len(self._exec_times):
+                self._exec_times = np.resize(self._exec_times, self._n * 2)
+            self._exec_times[self._n] = execution_time
+        self._n += 1
+    
     def get_trace_summary(self) -> Dict[str, Any]:
         """Возвращает краткую сводку трассировки"""
         try:
-            total_time = sum(step.execution_time for step in self.steps if step.execution_time)
+            if np is not None:
+                total_time = float(self._exec_times[:self._n].sum())
+            else:
+                total_time = math.fsum(self._exec_times)
             
             return {
                 "total_steps": len(self.steps),
@@ -150,31 +356,29 @@ Initial Phase: {state.current_phase.value.upper()}"""
     
     def trace_issues_found(self, issues: list):
         """Трассировка найденных проблем"""
-        if not issues:
+        if not issues or not self.logger.isEnabledFor(logging.INFO):
             return
         
-        self.logger.info(f"\n{Fore.RED}{Style.BRIGHT}{self.symbols['error']} ISSUES IDENTIFIED:{Style.RESET_ALL}")
+        # Отчет собирается целиком и выводится одной записью
+        lines = [f"\n{_BRIGHT_RED}{self.symbols['error']} ISSUES IDENTIFIED:{Style.RESET_ALL}"]
         
         for i, issue in enumerate(issues, 1):
             severity = issue.get('severity', 'unknown').upper()
-            severity_color = {
-                'CRITICAL': Fore.RED,
-                'HIGH': Fore.YELLOW,
-                'MEDIUM': Fore.BLUE,
-                'LOW': Fore.GREEN
-            }.get(severity, Fore.WHITE)
+            severity_color = _SEVERITY_COLOR.get(severity, Fore.WHITE)
             
-            self.logger.info(f"  {severity_color}{i}. [{severity}] {issue.get('description', 'No description')}{Style.RESET_ALL}")
+            lines.append(f"  {severity_color}{i}. [{severity}] {issue.get('description', 'No description')}{Style.RESET_ALL}")
             
             if issue.get('details'):
-                self.logger.info(f"     Details: {issue['details']}")
+                lines.append(f"     Details: {issue['details']}")
+        
+        self.logger.info("\n".join(lines))
     
     def trace_recommendations(self, recommendations: list):
         """Трассировка рекомендаций"""
-        if not recommendations:
+        if not recommendations or not self.logger.isEnabledFor(logging.INFO):
             return
         
-        self.logger.info(f"\n{Fore.CYAN}{Style.BRIGHT}{self.symbols['recommendation']} RECOMMENDATIONS:{Style.RESET_ALL}")
+        lines = [f"\n{_BRIGHT_CYAN}{self.symbols['recommendation']} RECOMMENDATIONS:{Style.RESET_ALL}"]
         
         for i, rec in enumerate(recommendations, 1):
             # Проверяем тип элемента списка
@@ -191,23 +395,21 @@ Initial Phase: {state.current_phase.value.upper()}"""
                 action = str(rec)
                 rationale = None
             
-            priority_color = {
-                'HIGH': Fore.RED,
-                'MEDIUM': Fore.YELLOW,
-                'LOW': Fore.GREEN
-            }.get(priority, Fore.WHITE)
+            priority_color = _PRIORITY_COLOR.get(priority, Fore.WHITE)
             
-            self.logger.info(f"  {priority_color}{i}. [{priority}] {action}{Style.RESET_ALL}")
+            lines.append(f"  {priority_color}{i}. [{priority}] {action}{Style.RESET_ALL}")
             
             if rationale:
-                self.logger.info(f"     Rationale: {rationale}")
+                lines.append(f"     Rationale: {rationale}")
+        
+        self.logger.info("\n".join(lines))
     
     def trace_action_plan(self, action_plan: list):
         """Трассировка плана действий"""
-        if not action_plan:
+        if not action_plan or not self.logger.isEnabledFor(logging.INFO):
             return
         
-        self.logger.info(f"\n{Fore.GREEN}{Style.BRIGHT}{self.symbols['action']} ACTION PLAN:{Style.RESET_ALL}")
+        lines = [f"\n{_BRIGHT_GREEN}{self.symbols['action']} ACTION PLAN:{Style.RESET_ALL}"]
         
         for i, action in enumerate(action_plan, 1):
             # Проверяем тип элемента списка
@@ -224,44 +426,40 @@ Initial Phase: {state.current_phase.value.upper()}"""
                 description = str(action)
                 estimated_time = None
             
-            status_symbol = {
-                'pending': '⏳',
-                'in_progress': '🔄',
-                'completed': '✅',
-                'failed': '❌'
-            }.get(status, '❓')
+            status_symbol = _STATUS_SYMBOL.get(status, '❓')
             
-            self.logger.info(f"  {status_symbol} {i}. {description}")
+            lines.append(f"  {status_symbol} {i}. {description}")
             
             if estimated_time:
-                self.logger.info(f"     ETA: {estimated_time}")
+                lines.append(f"     ETA: {estimated_time}")
+        
+        self.logger.info("\n".join(lines))
     
     def trace_session_complete(self, state: ReasoningState):
         """Трассировка завершения сессии"""
-        summary = state.get_execution_summary()
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
         
-        self._print_separator("═", color=Fore.MAGENTA)
+        summary = state.get_execution_summary()
+        errored = state.has_errors
         
         # Заголовок
-        status_symbol = self.symbols['success'] if not state.has_errors else self.symbols['error']
+        status_symbol = self.symbols['error'] if errored else self.symbols['success']
         header = f"{status_symbol} SESSION COMPLETED"
         
         # Сводка
-        summary_text = f"""Total Time: {summary['total_execution_time']:.2f}s
-Total Steps: {summary['total_steps']}
-Overall Confidence: {summary['overall_confidence']:.1%}
-Issues Found: {summary['issues_found']}
-Recommendations: {summary['recommendations_generated']}
-Action Items: {summary['action_items']}
-Errors: {summary['error_count']}"""
+        summary_text = _SESSION_SUMMARY_TMPL.format_map(summary)
         
-        color = Fore.GREEN if not state.has_errors else Fore.RED
-        self._print_box(header, summary_text, color)
+        color = Fore.RED if errored else Fore.GREEN
+        
+        # Разделители и рамки выводятся одной записью
+        separator = self._separator_line("═", color=Fore.MAGENTA)
+        parts = [separator, *self._box_lines(header, summary_text, color)]
         
         # Статистика по фазам
-        if summary.get('phase_statistics'):
+        phase_statistics = summary.get('phase_statistics')
+        if phase_statistics:
             phase_stats = []
-            phase_statistics = summary['phase_statistics']
             
             # Проверяем тип данных перед вызовом .items()
             if isinstance(phase_statistics, dict):
@@ -279,33 +477,46 @@ Errors: {summary['error_count']}"""
                 self.logger.warning(f"Unexpected type for phase_statistics: {type(phase_statistics)}")
             
             if phase_stats:
-                self._print_box("Phase Statistics", "\n".join(phase_stats), Fore.BLUE)
+                parts.extend(self._box_lines("Phase Statistics", "\n".join(phase_stats), Fore.BLUE))
         
-        self._print_separator("═", color=Fore.MAGENTA)
+        parts.append(separator)
+        self.logger.info("\n".join(parts))
     
     def trace_error(self, error_message: str, context: Dict[str, Any] = None):
         """Трассировка ошибки"""
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
+        
         timestamp = self._format_timestamp()
         
-        self.logger.error(f"\n{Fore.RED}[{timestamp}] {self.symbols['error']} ERROR: {error_message}{Style.RESET_ALL}")
+        self.logger.error(f"{self._error_prefix}{timestamp}] {self.symbols['error']} ERROR: {error_message}{self._reset}")
         
         if context:
-            context_str = json.dumps(context, indent=2, ensure_ascii=False)
+            context_str = _format_context(context)
             self._print_box("Error Context", context_str, Fore.RED)
     
     def trace_warning(self, warning_message: str):
         """Трассировка предупреждения"""
+        if not self.logger.isEnabledFor(logging.WARNING):
+            return
+        
         timestamp = self._format_timestamp()
-        self.logger.warning(f"{Fore.YELLOW}[{timestamp}] {self.symbols['warning']} WARNING: {warning_message}{Style.RESET_ALL}")
+        self.logger.warning(f"{self._warning_prefix}{timestamp}] {self.symbols['warning']} WARNING: {warning_message}{self._reset}")
     
     def trace_info(self, info_message: str):
         """Трассировка информационного сообщения"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
         timestamp = self._format_timestamp()
-        self.logger.info(f"{Fore.BLUE}[{timestamp}] {self.symbols['info']} {info_message}{Style.RESET_ALL}")
+        self.logger.info(f"{self._info_prefix}{timestamp}] {self.symbols['info']} {info_message}{self._reset}")
 
     def trace_data_requirements(self, data_requirements: list, target_services: list = None):
         """Трассировка требований к данным для селективного сбора"""
-        self.logger.info(f"\n{Fore.CYAN}{Style.BRIGHT}{self.symbols['data']} DATA REQUIREMENTS:{Style.RESET_ALL}")
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
+        self.logger.info(f"\n{_BRIGHT_CYAN}{self.symbols['data']} DATA REQUIREMENTS:{Style.RESET_ALL}")
         
         for i, req in enumerate(data_requirements, 1):
             self.logger.info(f"  {Fore.CYAN}{i}. {req}{Style.RESET_ALL}")
@@ -315,71 +526,43 @@ Errors: {summary['error_count']}"""
 
     def trace_data_collection(self, collected_data: Dict[str, Any], execution_time: float):
         """Трассировка сбора данных"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
         color = Fore.BLUE
         
         # Подсчет собранных данных
         data_summary = []
-        # Подсчет логов
-        if "logs" in collected_data and collected_data["logs"]:
-            logs_count = len(collected_data['logs']) if isinstance(collected_data['logs'], list) else 1
-            data_summary.append(f"{logs_count} логов")
-        
-        # Подсчет метрик с учетом структуры Datadog
-        if "metrics" in collected_data and collected_data["metrics"]:
-            metrics_count = 0
-            if isinstance(collected_data['metrics'], list):
-                for item in collected_data['metrics']:
-                    if isinstance(item, dict):
-                        # Если это метаданные, пропускаем
-                        if "_metadata" in item:
-                            continue
-                        # Если это категория метрик, считаем метрики внутри
-                        if "metrics" in item and isinstance(item["metrics"], list):
-                            metrics_count += len(item["metrics"])
-                        else:
-                            metrics_count += 1
-                    else:
-                        metrics_count += 1
-            else:
-                metrics_count = 1
-            data_summary.append(f"{metrics_count} метрик")
-        
-        # Подсчет критических ошибок
-        if "critical_errors" in collected_data and collected_data["critical_errors"]:
-            errors_count = len(collected_data['critical_errors']) if isinstance(collected_data['critical_errors'], list) else 1
-            data_summary.append(f"{errors_count} критических ошибок")
-        
-        # Сводка сервиса
-        if "service_summary" in collected_data and collected_data["service_summary"]:
-            if isinstance(collected_data['service_summary'], dict):
-                service_name = collected_data['service_summary'].get('service', 'неизвестный')
-                data_summary.append(f"сводка сервиса {service_name}")
-            else:
-                data_summary.append("сводка сервиса")
+        for key, counter in _COUNTERS.items():
+            value = collected_data.get(key)
+            if value:
+                data_summary.append(counter(value))
         
         summary_text = ", ".join(data_summary) if data_summary else "нет данных"
         
         self.logger.info(f"{color}{self.symbols['data']} Данные собраны: {summary_text}{Style.RESET_ALL}")
         self.logger.info(f"{color}⏱️  Время сбора: {execution_time:.2f}с{Style.RESET_ALL}")
         
-        # Детальная информация о собранных данных
-        for key, value in collected_data.items():
-            if value:
-                if isinstance(value, list):
-                    self.logger.info(f"  📋 {key}: {len(value)} элементов")
-                elif isinstance(value, dict):
-                    self.logger.info(f"  📊 {key}: словарь с {len(value)} ключами")
-                else:
-                    self.logger.info(f"  📄 {key}: {type(value).__name__}")
+        # Детальная информация о собранных данных (только в DEBUG, одной записью)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            details = [
+                f"  📋 {key}: {len(value)} элементов" if isinstance(value, list)
+                else f"  📊 {key}: словарь с {len(value)} ключами" if isinstance(value, dict)
+                else f"  📄 {key}: {type(value).__name__}"
+                for key, value in collected_data.items() if value
+            ]
+            if details:
+                self.logger.debug("\n".join(details))
 
     def _summarize_data(self, data: Dict[str, Any], max_length: int = 100) -> str:
         """Создать краткую сводку данных"""
         if isinstance(data, dict):
-            keys = list(data.keys())
-            if len(keys) <= 3:
-                return f"{{keys: {keys}}}"
-            else:
-                return f"{{keys: {keys[:3]}... (+{len(keys)-3} more)}}"
+            # В сводку попадают не более трех ключей - полный список ключей не строится
+            keys = list(itertools.islice(data, 3))
+            extra = len(data) - 3
+            if extra > 0:
+                return f"{{keys: {keys}... (+{extra} more)}}"
+            return f"{{keys: {keys}}}"
         elif isinstance(data, list):
             return f"[{len(data)} items]"
         else:
@@ -390,4 +573,23 @@ Errors: {summary['error_count']}"""
 
 
 # Глобальный экземпляр трассировщика
-tracer = ReasoningTracer()
\ No newline at end of file
+_tracer: Optional[ReasoningTracer] = None
+
+
+def get_tracer() -> ReasoningTracer:
+    """
+    Глобальный трассировщик (создается при первом вызове)
+    
+    Обработчики логов настраиваются при первом обращении, а не при импорте модуля
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = ReasoningTracer()
+    return _tracer
+
+
+def __getattr__(name: str) -> Any:
+    """Ленивый доступ к глобальному трассировщику как к атрибуту модуля tracer (PEP 562)"""
+    if name == "tracer":
+        return get_tracer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
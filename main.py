@@ -1,21 +1,85 @@
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
-import json
+from pydantic import BaseModel, ConfigDict, StringConstraints
+from typing import Annotated, Dict, Any, List, Optional
+import aiofiles
+import asyncio
+import hashlib
+import hmac
+import httpx
+import orjson
 import os
 import logging
-from datetime import datetime
+import time
+import weakref
+from datetime import datetime, timezone
+from cachetools import TTLCache
 from colorama import Fore, Style, init
 
 from core.orchestrator import AIOrchestrator
+from core.llm_cache import SemanticLLMCache
 from core.reasoning_state import ReasoningState
-from core.backend_client import BackendClient, BackendClientError, ServiceNotFoundError, SessionNotFoundError
+from core.backend_client import (
+    AuthenticationError, BackendClient, BackendClientError, ServiceNotFoundError, SessionNotFoundError
+)
 from core.context_formatter import ContextFormatter
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Общий HTTP клиент на время жизни приложения: соединения переиспользуются между запросами"""
+    # Клиент обслуживает и бекенд, и оркестраторы (OpenAI, Datadog), поэтому таймаут чтения рассчитан на LLM
+    app.state.http = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=10.0)
+    )
+    # Фоновые задачи (сохранение сообщений в чат); ссылки хранятся, чтобы задачи не собрал GC
+    app.state.pending_tasks = set()
+    # Один семантический кэш LLM на процесс; загрузка модели эмбеддингов не блокирует event loop
+    app.state.llm_cache = await asyncio.to_thread(SemanticLLMCache, persist_path=os.getenv("LLM_CACHE_PATH"))
+    # Схема OpenAPI строится до приема запросов, а не при первом обращении к /docs
+    app.openapi()
+    try:
+        yield
+    finally:
+        # Дожидаемся незавершенных сохранений до закрытия HTTP клиента
+        await asyncio.gather(*app.state.pending_tasks, return_exceptions=True)
+        # Оркестраторы отправляют буферы метрик Datadog, пока HTTP клиент еще открыт
+        await asyncio.gather(*(orchestrator.aclose() for orchestrator in list(_orchestrators)), return_exceptions=True)
+        _get_or_create_orchestrator.cache_clear()
+        app.state.llm_cache.close()
+        await app.state.http.aclose()
+
+# Созданные оркестраторы (для закрытия при остановке; вытесненные из кэша удаляются GC)
+_orchestrators: "weakref.WeakSet[AIOrchestrator]" = weakref.WeakSet()
+
+@lru_cache(maxsize=64)
+def _get_or_create_orchestrator(api_key: str, app_key: str, http_client: httpx.AsyncClient,
+                                llm_cache: SemanticLLMCache) -> AIOrchestrator:
+    """
+    Оркестратор для пары ключей Datadog (создается один раз и переиспользуется)
+    
+    Args:
+        api_key: API ключ Datadog сервиса
+        app_key: Application ключ Datadog сервиса
+        http_client: Общий HTTP клиент приложения (оркестратор его не закрывает)
+        llm_cache: Семантический кэш LLM процесса
+        
+    Returns:
+        AIOrchestrator с ключами сервиса
+    """
+    orchestrator = AIOrchestrator(dd_api_key=api_key, dd_app_key=app_key, http_client=http_client, llm_cache=llm_cache)
+    _orchestrators.add(orchestrator)
+    return orchestrator
+
 # Создаем экземпляр FastAPI приложения
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title="AI Orchestrator",
     description="Система оркестрации AI агентов с трехфазным рассуждением",
     version="2.0.0",
@@ -32,6 +96,9 @@ app = FastAPI(
     ]
 )
 
+# Сжатие ответов от 1 КБ (длинные ответы /orchestrate, /system-stats)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Добавляем схему безопасности в OpenAPI
 from fastapi.openapi.utils import get_openapi
 
@@ -53,13 +120,8 @@ def custom_openapi():
         }
     }
     
-    # Добавляем требования безопасности для защищенных эндпоинтов
-    for path, path_item in openapi_schema["paths"].items():
-        for method, operation in path_item.items():
-            if method.lower() in ["get", "post", "put", "delete", "patch"]:
-                # Добавляем безопасность только для эндпоинта /orchestrate
-                if path == "/orchestrate":
-                    operation["security"] = [{"BearerAuth": []}]
+    # Безопасность требуется только для эндпоинта /orchestrate
+    openapi_schema["paths"]["/orchestrate"]["post"]["security"] = [{"BearerAuth": []}]
     
     app.openapi_schema = openapi_schema
     return app.openapi_schema
@@ -69,15 +131,47 @@ app.openapi = custom_openapi
 # Схема безопасности для Bearer токена
 security = HTTPBearer()
 
+async def get_backend_client(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> BackendClient:
+    """BackendClient с токеном запроса поверх общего HTTP клиента приложения"""
+    return BackendClient(bearer_token=credentials.credentials, http_client=request.app.state.http)
+
+async def verify_admin_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> None:
+    """Проверка Bearer токена администратора (ADMIN_TOKEN); без ADMIN_TOKEN админ-эндпоинты отключены"""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Административные операции отключены (ADMIN_TOKEN не задан)")
+    if not hmac.compare_digest(credentials.credentials.encode(), admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Неверный токен администратора")
+
 # Инициализация оркестратора (API ключ будет загружен из переменных окружения)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "your-api-key-here")
-# Инициализация оркестратора без ключей (они будут переданы в каждом запросе)
-orchestrator = None
+
+def get_orchestrator(service_info: Dict[str, Any]) -> AIOrchestrator:
+    """
+    Оркестратор для ключей Datadog сервиса
+    
+    Глобального оркестратора нет: каждый запрос получает экземпляр для своих ключей,
+    поэтому параллельные запросы разных сервисов не используют чужие ключи.
+    
+    Args:
+        service_info: Информация о сервисе с apiKey и appKey
+        
+    Returns:
+        AIOrchestrator с ключами сервиса
+    """
+    return _get_or_create_orchestrator(service_info['apiKey'], service_info['appKey'], app.state.http, app.state.llm_cache)
 
 # Инициализация клиентов для работы с бекендом
 backend_client = BackendClient()
 context_formatter = ContextFormatter()
 
+# Кэш информации о сервисах: ключи Datadog меняются редко, повторный запрос к бекенду не нужен
+_service_info_cache: TTLCache = TTLCache(maxsize=1024, ttl=60)
+_service_info_lock = asyncio.Lock()
+
 # Инициализация colorama для цветного вывода
 init(autoreset=True)
 
@@ -89,19 +183,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger("AI_Orchestrator")
 
+@lru_cache(maxsize=1)
+def _iso_timestamp(second: int) -> str:
+    """Временная метка UTC для ответов (форматируется один раз в секунду)"""
+    return datetime.fromtimestamp(second, timezone.utc).isoformat(timespec='seconds')
+
 # Модели данных
+# Общая конфигурация моделей API: лишние поля отбрасываются, экземпляры неизменяемы
+_MODEL_CONFIG = ConfigDict(extra="ignore", frozen=True, str_strip_whitespace=True)
+
+# Идентификаторы и запрос ограничены по длине: слишком большие тела отклоняются до обращения к бекенду
+IdentifierStr = Annotated[str, StringConstraints(min_length=1, max_length=128)]
+PromptStr = Annotated[str, StringConstraints(max_length=32_000)]
+
 class AgentInfo(BaseModel):
+    model_config = _MODEL_CONFIG
+    
     name: str
     description: str
     status: str
 
 class ContextAnalysisRequest(BaseModel):
-    service_id: str
-    session_id: str
-    prompt: str
+    model_config = _MODEL_CONFIG
+    
+    service_id: IdentifierStr
+    session_id: IdentifierStr
+    prompt: PromptStr
     include_trace: bool = True
 
 class ContextAnalysisResponse(BaseModel):
+    model_config = _MODEL_CONFIG
+    
     session_id: str
     service_id: str
     prompt: str
@@ -110,68 +222,142 @@ class ContextAnalysisResponse(BaseModel):
     execution_time: float
 
 # Корневой эндпоинт
+_ROOT_PAYLOAD_STATIC = {
+    "message": "Добро пожаловать в AI Orchestrator v2.0!",
+    "version": "2.0.0",
+    "features": (
+        "Трехфазное рассуждение (Planning, Execution, Feedback)",
+        "Интеграция с Google Gemini AI",
+        "Цветная трассировка в консоли",
+        "Анализ логов и метрик системы"
+    ),
+    "endpoints": (
+        "/health - проверка состояния сервера",
+        "/agents - список доступных агентов", 
+        "/analyze - новый эндпоинт для AI анализа",
+        "/orchestrate - основной эндпоинт для оркестрации",
+        "/mock-data - получение тестовых данных",
+        "/docs - документация API"
+    )
+}
+
 @app.get("/", tags=["system"], summary="Корневой эндпоинт")
 async def root():
-    return {
-        "message": "Добро пожаловать в AI Orchestrator v2.0!",
-        "version": "2.0.0",
-        "timestamp": datetime.now().isoformat(),
-        "features": [
-            "Трехфазное рассуждение (Planning, Execution, Feedback)",
-            "Интеграция с Google Gemini AI",
-            "Цветная трассировка в консоли",
-            "Анализ логов и метрик системы"
-        ],
-        "endpoints": [
-            "/health - проверка состояния сервера",
-            "/agents - список доступных агентов", 
-            "/analyze - новый эндпоинт для AI анализа",
-            "/orchestrate - основной эндпоинт для оркестрации",
-            "/mock-data - получение тестовых данных",
-            "/docs - документация API"
-        ]
-    }
+    return {**_ROOT_PAYLOAD_STATIC, "timestamp": _iso_timestamp(int(time.time()))}
 
 # Проверка состояния сервера
+_HEALTH_PAYLOAD = {
+    "status": "healthy",
+    "service": "AI Orchestrator"
+}
+
 @app.get("/health", tags=["system"], summary="Проверка состояния сервиса")
 async def health_check():
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "service": "AI Orchestrator"
-    }
+    return {**_HEALTH_PAYLOAD, "timestamp": _iso_timestamp(int(time.time()))}
+
+# Список агентов неизменен - сериализуется один раз при импорте
+_AGENTS = (
+    AgentInfo(
+        name="data_agent",
+        description="Агент для работы с данными логов и метрик",
+        status="available"
+    ),
+    AgentInfo(
+        name="protocol_agent", 
+        description="Агент для анализа по протоколам и генерации рекомендаций",
+        status="available"
+    ),
+    AgentInfo(
+        name="planning_agent",
+        description="Агент планирования анализа (LLM)",
+        status="available"
+    ),
+    AgentInfo(
+        name="execution_agent",
+        description="Агент выполнения анализа (LLM)",
+        status="available"
+    ),
+    AgentInfo(
+        name="feedback_agent",
+        description="Агент обратной связи и рекомендаций (LLM)",
+        status="available"
+    )
+)
+_AGENTS_JSON = orjson.dumps([agent.model_dump() for agent in _AGENTS])
 
 # Получение списка доступных агентов
 @app.get("/agents", response_model=List[AgentInfo], tags=["system"], summary="Получить список доступных агентов")
 async def get_agents():
-    agents = [
-        AgentInfo(
-            name="data_agent",
-            description="Агент для работы с данными логов и метрик",
-            status="available"
-        ),
-        AgentInfo(
-            name="protocol_agent", 
-            description="Агент для анализа по протоколам и генерации рекомендаций",
-            status="available"
-        ),
-        AgentInfo(
-            name="planning_agent",
-            description="Агент планирования анализа (LLM)",
-            status="available"
-        ),
-        AgentInfo(
-            name="execution_agent",
-            description="Агент выполнения анализа (LLM)",
-            status="available"
-        ),
-        AgentInfo(
-            name="feedback_agent",
-            description="Агент обратной связи и рекомендаций (LLM)",
-            status="available"
+    return Response(content=_AGENTS_JSON, media_type="application/json")
+
+# Поля ответа по убыванию приоритета (summary - итог фазы обратной связи)
+ANSWER_KEYS = ("main_response", "summary", "recommendations", "analysis_results")
+_EMPTY_MARKERS = frozenset(("{}", "[]", ""))
+
+def _first_nonempty(data: Dict[str, Any], keys: tuple) -> str:
+    """
+    Первое непустое поле ответа
+    
+    Args:
+        data: Ответ фазы рассуждения
+        keys: Поля в порядке приоритета
+        
+    Returns:
+        Текст ответа (списки объединяются построчно) или пустая строка
+    """
+    value = next((data[key] for key in keys if data.get(key)), "")
+    if isinstance(value, list):
+        return "\n".join(map(str, value))
+    return value if isinstance(value, str) else str(value)
+
+def _service_cache_key(service_id: str, bearer_token: Optional[str]) -> tuple:
+    """Ключ кэша сервиса: записи разных токенов не пересекаются, сам токен не хранится"""
+    token_hash = hashlib.blake2b((bearer_token or "").encode(), digest_size=8).hexdigest()
+    return service_id, token_hash
+
+async def get_service_info_cached(client: BackendClient, service_id: str) -> Dict[str, Any]:
+    """
+    Информация о сервисе с кэшированием на время TTL
+    
+    Args:
+        client: Клиент бекенда с токеном запроса
+        service_id: ID сервиса
+        
+    Returns:
+        Dict с информацией о сервисе
+        
+    Raises:
+        ServiceNotFoundError, BackendClientError: Ошибки бекенда (не кэшируются)
+    """
+    key = _service_cache_key(service_id, client.bearer_token)
+    async with _service_info_lock:
+        service_info = _service_info_cache.get(key)
+    if service_info is not None:
+        return service_info
+    
+    service_info = await client.get_service_info(service_id)
+    async with _service_info_lock:
+        _service_info_cache[key] = service_info
+    return service_info
+
+async def invalidate_service_info(service_id: str, bearer_token: Optional[str]):
+    """Удаление записи кэша сервиса (при 401/404 от бекенда)"""
+    async with _service_info_lock:
+        _service_info_cache.pop(_service_cache_key(service_id, bearer_token), None)
+
+async def _safe_add_message(client: BackendClient, request: ContextAnalysisRequest, answer: str):
+    """Сохранение ответа в чат сессии; ошибки только логируются (ответ клиенту уже отправлен)"""
+    try:
+        await client.add_message(
+            session_id=request.session_id,
+            prompt=request.prompt,
+            answer=answer
         )
-    ]
-    return agents
+    except AuthenticationError as e:
+        logger.error(f"Ошибка аутентификации при сохранении: {e}")
+        await invalidate_service_info(request.service_id, client.bearer_token)
+    except BackendClientError as e:
+        logger.error(f"Не удалось сохранить результат: {e}")
 
 # Эндпоинт для оркестрации агентов с контекстом из бекенда
 @app.post("/orchestrate", 
@@ -187,7 +373,7 @@ async def get_agents():
           })
 async def orchestrate(
     request: ContextAnalysisRequest, 
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    authenticated_backend_client: BackendClient = Depends(get_backend_client)
 ):
     """
     Эндпоинт для оркестрации AI агентов с контекстом из бекенда
@@ -221,7 +407,7 @@ async def orchestrate(
     
     Args:
          request: Запрос с service_id, session_id и prompt
-         credentials: Bearer токен для аутентификации
+         authenticated_backend_client: Клиент бекенда с Bearer токеном запроса
         
     Returns:
         ContextAnalysisResponse: Результат анализа с ответом AI агентов
@@ -231,58 +417,48 @@ async def orchestrate(
         HTTPException 404: При отсутствии сервиса или сессии
         HTTPException 500: При внутренних ошибках сервера
     """
-    start_time = datetime.now()
-    
-    # Извлекаем Bearer токен из заголовка
-    bearer_token = credentials.credentials
+    start = time.perf_counter()
     
     try:
-        # Создаем BackendClient с токеном для аутентифицированных запросов
-        authenticated_backend_client = BackendClient(bearer_token=bearer_token)
+        # 1-2. Получаем информацию о сервисе (включая ключи Datadog) и историю чата параллельно
+        service_info, chat_messages = await asyncio.gather(
+            get_service_info_cached(authenticated_backend_client, request.service_id),
+            authenticated_backend_client.get_chat_messages(request.session_id),
+            return_exceptions=True
+        )
         
-        # 1. Получаем информацию о сервисе (включая ключи Datadog)
-        try:
-            service_info = await authenticated_backend_client.get_service_info(request.service_id)
-        except ServiceNotFoundError:
+        # Отклоненный токен обрабатывается одним обработчиком ниже
+        for outcome in (service_info, chat_messages):
+            if isinstance(outcome, AuthenticationError):
+                raise outcome
+        
+        if isinstance(service_info, ServiceNotFoundError):
             logger.error(f"Сервис не найден: {request.service_id}")
             raise HTTPException(
                 status_code=404,
                 detail=f"Сервис с ID {request.service_id} не найден"
             )
-        except BackendClientError as e:
-            # Проверяем, является ли ошибка связанной с аутентификацией
-            if "401" in str(e) or "Unauthorized" in str(e):
-                raise HTTPException(
-                    status_code=401,
-                    detail="Ошибка аутентификации: недействительный или отсутствующий Bearer токен"
-                )
-            else:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Ошибка при получении информации о сервисе: {str(e)}"
-                )
+        if isinstance(service_info, BackendClientError):
+            raise HTTPException(
+                status_code=500,
+                detail=f"Ошибка при получении информации о сервисе: {str(service_info)}"
+            )
+        if isinstance(service_info, BaseException):
+            raise service_info
         
-        # 2. Получаем историю чата
-        try:
-            chat_messages = await authenticated_backend_client.get_chat_messages(request.session_id)
-        except SessionNotFoundError:
+        if isinstance(chat_messages, SessionNotFoundError):
             logger.error(f"Сессия не найдена: {request.session_id}")
             raise HTTPException(
                 status_code=404,
                 detail=f"Сессия с ID {request.session_id} не найдена"
             )
-        except BackendClientError as e:
-            # Проверяем, является ли ошибка связанной с аутентификацией
-            if "401" in str(e) or "Unauthorized" in str(e):
-                raise HTTPException(
-                    status_code=401,
-                    detail="Ошибка аутентификации: недействительный или отсутствующий Bearer токен"
-                )
-            else:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Ошибка при получении истории чата: {str(e)}"
-                )
+        if isinstance(chat_messages, BackendClientError):
+            raise HTTPException(
+                status_code=500,
+                detail=f"Ошибка при получении истории чата: {str(chat_messages)}"
+            )
+        if isinstance(chat_messages, BaseException):
+            raise chat_messages
         
         # 3. Форматируем контекст
         # Используем правильный метод format_chat_context, который уже включает новый промпт
@@ -291,22 +467,15 @@ async def orchestrate(
             request.prompt
         )
         
-        # 4. Инициализируем оркестратор с ключами из сервиса
-        global orchestrator
-        orchestrator = AIOrchestrator(
-            dd_api_key=service_info['apiKey'],
-            dd_app_key=service_info['appKey']
-        )
-        
-        # 5. Выполняем анализ
-        ai_start_time = datetime.now()
-        
-        result = await orchestrator.process_query(full_prompt)
+        # 4. Получаем оркестратор для ключей сервиса
+        orchestrator = get_orchestrator(service_info)
         
-        ai_end_time = datetime.now()
-        ai_duration = (ai_end_time - ai_start_time).total_seconds()
+        # 5. Выполняем анализ; план кэшируется только для запроса без истории чата:
+        # модель эмбеддингов обрезает длинный текст, и с историей разные запросы дали бы один ключ
+        plan_cache_key = None if chat_messages.get('messages') else request.prompt
+        result = await orchestrator.process_query(full_prompt, cache_key=plan_cache_key)
         
-        execution_time = (datetime.now() - start_time).total_seconds()
+        execution_time = time.perf_counter() - start
         
         # 6. Извлекаем простой ответ из результата
         # result теперь является ReasoningState объектом
@@ -314,62 +483,46 @@ async def orchestrate(
         
         # Извлекаем ответ из различных возможных полей
         if isinstance(final_feedback, dict):
-            answer = (
-                final_feedback.get("main_response", "") or
-                final_feedback.get("recommendations", "") or
-                final_feedback.get("analysis_results", "") or
-                str(final_feedback)
-            )
+            answer = _first_nonempty(final_feedback, ANSWER_KEYS) or str(final_feedback)
         else:
             answer = str(final_feedback) if final_feedback else "Анализ завершен, но ответ не сформирован"
         
         # Если ответ все еще пустой, попробуем получить из последнего шага рассуждения
-        if not answer or answer == "{}":
+        if answer in _EMPTY_MARKERS:
             latest_step = result.get_latest_step()
             if latest_step and latest_step.output_data:
                 step_output = latest_step.output_data
-                answer = (
-                    step_output.get("main_response", "") or
-                    step_output.get("recommendations", "") or
-                    step_output.get("analysis_results", "") or
-                    str(step_output)
-                )
+                answer = _first_nonempty(step_output, ANSWER_KEYS) or str(step_output)
         
         # Финальная проверка
-        if not answer or answer in ["{}", "[]", ""]:
+        if answer in _EMPTY_MARKERS:
             answer = f"Анализ завершен. Обработано {len(result.reasoning_steps)} шагов рассуждения."
         
-        # 7. Сохраняем результат в чат
-        try:
-            await authenticated_backend_client.add_message(
-                session_id=request.session_id,
-                prompt=request.prompt,
-                answer=answer
-            )
-        except BackendClientError as e:
-            # Проверяем, является ли ошибка связанной с аутентификацией
-            if "401" in str(e) or "Unauthorized" in str(e):
-                logger.error(f"Ошибка аутентификации при сохранении: {e}")
-                raise HTTPException(
-                    status_code=401,
-                    detail="Ошибка аутентификации: недействительный или отсутствующий Bearer токен"
-                )
-            else:
-                logger.error(f"Не удалось сохранить результат: {e}")
-                # Продолжаем выполнение, так как основная задача выполнена
+        # 7. Сохраняем результат в чат в фоне: ответ клиенту не ждет бекенд
+        task = asyncio.create_task(_safe_add_message(authenticated_backend_client, request, answer))
+        app.state.pending_tasks.add(task)
+        task.add_done_callback(app.state.pending_tasks.discard)
         
         # 9. Формируем простой ответ
-        response = ContextAnalysisResponse(
-            session_id=request.session_id,
-            service_id=request.service_id,
-            prompt=request.prompt,
-            answer=answer,
-            status="completed",
-            execution_time=execution_time
-        )
-        
-        return response
+        # Схема ответа описана ContextAnalysisResponse (response_model), но модель не строится:
+        # словарь сериализуется напрямую orjson без повторной валидации
+        return ORJSONResponse({
+            "session_id": request.session_id,
+            "service_id": request.service_id,
+            "prompt": request.prompt,
+            "answer": answer,
+            "status": "completed",
+            "execution_time": execution_time
+        })
         
+    except AuthenticationError as e:
+        logger.error(f"Ошибка аутентификации: {e}")
+        # Токен отклонен - закэшированная по нему запись сервиса больше не действительна
+        await invalidate_service_info(request.service_id, authenticated_backend_client.bearer_token)
+        raise HTTPException(
+            status_code=401,
+            detail="Ошибка аутентификации: недействительный или отсутствующий Bearer токен"
+        )
     except HTTPException:
         # Перебрасываем HTTP исключения как есть
         raise
@@ -379,6 +532,21 @@ async def orchestrate(
             detail=f"Ошибка при выполнении анализа с контекстом: {str(e)}"
         )
 
+# Сброс кэша информации о сервисах
+@app.post("/admin/cache/flush", tags=["system"], summary="Сбросить кэш информации о сервисах",
+          dependencies=[Depends(verify_admin_token)])
+async def flush_service_cache():
+    """
+    Очистка кэша сервисов (например, после смены ключей Datadog)
+    
+    Кэш хранится в памяти каждого воркера uvicorn, а запрос попадает в один из них:
+    остальные воркеры обновят записи по истечении TTL (60 секунд).
+    """
+    async with _service_info_lock:
+        flushed = len(_service_info_cache)
+        _service_info_cache.clear()
+    return {"status": "flushed", "entries": flushed, "worker_pid": os.getpid()}
+
 # Получение статистики системы
 @app.get("/system-stats", tags=["system"], summary="Получить системную статистику")
 async def get_system_stats():
@@ -387,13 +555,20 @@ async def get_system_stats():
         # Проверяем наличие сохраненных данных
         data_dir = os.path.join(os.path.dirname(__file__), 'data')
         data_path = os.path.join(data_dir, 'collected_data.json')
+        meta_path = os.path.join(data_dir, 'collected_data.meta.json')
+        
+        # Один stat вместо повторных проверок существования
+        try:
+            data_size = os.stat(data_path).st_size
+        except FileNotFoundError:
+            data_size = None
         
         result = {
             "system_status": "active",
             "data_collection": {
                 "enabled": True,
                 "last_collection": None,
-                "data_available": os.path.exists(data_path)
+                "data_available": data_size is not None
             },
             "agents_status": {
                 "data_agent": "ready",
@@ -402,11 +577,23 @@ async def get_system_stats():
             }
         }
         
-        if os.path.exists(data_path):
-            with open(data_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                result["data_collection"]["last_collection"] = data.get("metadata", {}).get("collection_timestamp")
-                result["data_collection"]["records_count"] = len(data.get("logs", []))
+        if data_size:
+            try:
+                # Краткие метаданные, записанные DataAgent вместе с данными
+                async with aiofiles.open(meta_path, 'rb') as f:
+                    meta = orjson.loads(await f.read())
+            except FileNotFoundError:
+                meta = None
+            
+            if meta is not None:
+                result["data_collection"]["last_collection"] = meta.get("collection_timestamp")
+                result["data_collection"]["records_count"] = meta.get("records_count", 0)
+            else:
+                async with aiofiles.open(data_path, 'rb') as f:
+                    data = orjson.loads(await f.read())
+                metadata = data.get("collection_metadata") or data.get("metadata", {})
+                result["data_collection"]["last_collection"] = metadata.get("timestamp") or metadata.get("collection_timestamp")
+                result["data_collection"]["records_count"] = len(data.get("server_logs") or data.get("logs", []))
                 
         return result
         
@@ -414,5 +601,17 @@ async def get_system_stats():
         raise HTTPException(status_code=500, detail=f"Ошибка при загрузке mock данных: {str(e)}")
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    
+    # Перезагрузка по изменениям файлов только в разработке (DEV=1): с ней недоступны воркеры
+    dev_mode = os.getenv("DEV") == "1"
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=1 if dev_mode else min(os.cpu_count() or 1, 4),
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        reload=dev_mode
+    )
\ No newline at end of file
@@ -5,48 +5,57 @@ datadog_fetch.py
 """
 
 import argparse
-import requests
-import json
+import asyncio
+import httpx
+import logging
+import orjson
+import os
+import sys
 from datetime import datetime, timedelta
+from dotenv import load_dotenv
 
 # ==== Настройки ====
-DD_API_KEY = "3cb244343cf0b67a853fab8dd26adace"
-DD_APP_KEY = "1879f3e74ab7e870e5fb9e1558f4427633cb1bcc"
-DATADOG_SITE = "datadoghq.eu"  # если у тебя global — поменяй на datadoghq.com
-
-API_BASE = f"https://api.{DATADOG_SITE}"
-HEADERS = {
-    "DD-API-KEY": DD_API_KEY,
-    "DD-APPLICATION-KEY": DD_APP_KEY,
-    "Content-Type": "application/json",
-    "Accept": "application/json",
-}
+DEFAULT_SITE = "datadoghq.eu"  # если у тебя global — передай --site datadoghq.com
+
+logger = logging.getLogger(__name__)
 
 # ==== Утилиты ====
+def build_headers() -> dict:
+    """Заголовки аутентификации из переменных окружения DD_API_KEY / DD_APP_KEY"""
+    load_dotenv()
+    api_key = os.getenv("DD_API_KEY")
+    app_key = os.getenv("DD_APP_KEY")
+    if not api_key or not app_key:
+        sys.exit("❌ Задайте DD_API_KEY и DD_APP_KEY в окружении или в .env (см. .env.example)")
+    return {
+        "DD-API-KEY": api_key,
+        "DD-APPLICATION-KEY": app_key,
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+
 def epoch_seconds(dt: datetime) -> int:
     return int(dt.timestamp())
 
 def print_json(obj):
-    print(json.dumps(obj, indent=2, ensure_ascii=False))
+    sys.stdout.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode() + "\n")
 
 # ==== Метрики ====
-def query_metrics(query: str, start_dt: datetime, end_dt: datetime):
+async def query_metrics(client: httpx.AsyncClient, query: str, start_dt: datetime, end_dt: datetime):
     """Запрашивает метрики по API v1/query"""
-    url = f"{API_BASE}/api/v1/query"
     params = {
         "from": epoch_seconds(start_dt),
         "to": epoch_seconds(end_dt),
         "query": query,
     }
-    resp = requests.get(url, headers=HEADERS, params=params, timeout=30)
+    resp = await client.get("/api/v1/query", params=params)
     if resp.status_code != 200:
         raise RuntimeError(f"Metrics query failed: {resp.status_code} {resp.text}")
     return resp.json()
 
 # ==== Логи ====
-def fetch_logs(query: str, start_dt: datetime, end_dt: datetime, limit_per_page: int = 10):
+async def fetch_logs(client: httpx.AsyncClient, query: str, start_dt: datetime, end_dt: datetime, limit_per_page: int = 10):
     """Запрашивает логи по API v2/logs/events/search (аналог твоего curl)"""
-    url = f"{API_BASE}/api/v2/logs/events/search"
     body = {
         "filter": {
             "query": query,
@@ -57,38 +66,51 @@ def fetch_logs(query: str, start_dt: datetime, end_dt: datetime, limit_per_page:
         "sort": "timestamp"
     }
 
-    resp = requests.post(url, headers=HEADERS, json=body, timeout=30)
+    resp = await client.post("/api/v2/logs/events/search", json=body)
     if resp.status_code != 200:
         raise RuntimeError(f"Logs query failed: {resp.status_code} {resp.text}")
     return resp.json()
 
 # ==== Основной код ====
+async def main(start: datetime, end: datetime, site: str = DEFAULT_SITE):
+    """Метрики и логи запрашиваются параллельно через одно соединение"""
+    metrics_query = "avg:system.cpu.user{*}"  # можешь поменять под свой хост
+    logs_query = "service:auarai AND env:prod"  # как в твоем curl
+
+    async with httpx.AsyncClient(base_url=f"https://api.{site}", headers=build_headers(), http2=True, timeout=30) as client:
+        metrics, logs_data = await asyncio.gather(
+            query_metrics(client, metrics_query, start, end),
+            fetch_logs(client, logs_query, start, end, limit_per_page=10),
+            return_exceptions=True
+        )
+
+    # ---- Метрики ----
+    logger.info("\n=== METRICS ===")
+    if isinstance(metrics, Exception):
+        logger.error("Ошибка при запросе метрик: %s", metrics)
+    else:
+        print_json(metrics)
+
+    # ---- Логи ----
+    logger.info("\n=== LOGS ===")
+    if isinstance(logs_data, Exception):
+        logger.error("Ошибка при запросе логов: %s", logs_data)
+    else:
+        print_json(logs_data)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Fetch Datadog metrics and logs for a given time range.")
     parser.add_argument("--minutes", type=int, help="Период в минутах", default=15)
     parser.add_argument("--hours", type=int, help="Период в часах", default=0)
+    parser.add_argument("--site", help="Сайт Datadog", default=DEFAULT_SITE)
     args = parser.parse_args()
 
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(message)s")
+
     delta = timedelta(minutes=args.minutes, hours=args.hours)
     end = datetime.utcnow()
     start = end - delta
 
-    print(f"\n=== Запрос данных Datadog c {start} по {end} (UTC) ===")
-
-    # ---- Метрики ----
-    try:
-        print("\n=== METRICS ===")
-        metrics_query = "avg:system.cpu.user{*}"  # можешь поменять под свой хост
-        metrics = query_metrics(metrics_query, start, end)
-        print_json(metrics)
-    except Exception as e:
-        print("Ошибка при запросе метрик:", e)
+    logger.info(f"\n=== Запрос данных Datadog c {start} по {end} (UTC) ===")
 
-    # ---- Логи ----
-    try:
-        print("\n=== LOGS ===")
-        logs_query = "service:auarai AND env:prod"  # как в твоем curl
-        logs_data = fetch_logs(logs_query, start, end, limit_per_page=10)
-        print_json(logs_data)
-    except Exception as e:
-        print("Ошибка при запросе логов:", e)
+    asyncio.run(main(start, end, args.site))
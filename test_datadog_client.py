@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Тесты буфера метрик DatadogClient без обращения к Datadog (httpx.MockTransport)
+"""
+
+import asyncio
+import unittest
+from unittest import mock
+
+import httpx
+import orjson
+
+from core.datadog_client import DatadogClient
+
+
+class MetricBufferTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append((request.url.path, orjson.loads(request.content)))
+            return httpx.Response(202, json={"status": "ok"})
+
+        self.http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = DatadogClient("api", "app", http_client=self.http)
+
+    async def asyncTearDown(self):
+        await self.http.aclose()
+
+    def sent_points(self):
+        return sum(len(series["points"]) for path, body in self.requests if path == "/api/v1/series" for series in body["series"])
+
+    async def test_full_buffer_is_flushed_in_background(self):
+        for i in range(self.client._metric_flush_size):
+            self.client.send_metric("app.requests", i, tags=["env:test"])
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.sent_points(), self.client._metric_flush_size)
+        series = self.requests[0][1]["series"]
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0]["tags"], ["env:test"])
+        await self.client.aclose()
+
+    async def test_interval_drain_and_aclose(self):
+        self.client._metric_flush_interval = 0.02
+        self.client.send_metric("app.latency", 1.5)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.sent_points(), 1)
+
+        # Остаток отправляется при закрытии
+        self.client._metric_flush_interval = 10.0
+        self.client.send_metric("app.latency", 2.5)
+        self.client.send_metric("app.errors", 1)
+        await self.client.aclose()
+        self.assertEqual(self.sent_points(), 3)
+        self.assertEqual(self.client._metric_buf, [])
+
+    async def test_event_is_sent_before_close(self):
+        self.client.send_event("deploy", "v2.0.0", tags=["env:test"])
+        await self.client.aclose()
+        self.assertEqual([path for path, _ in self.requests], ["/api/v1/events"])
+
+    async def test_disabled_client_sends_nothing(self):
+        self.client.enabled = False
+        self.client.send_metric("app.requests", 1)
+        self.client.send_event("deploy", "v2.0.0")
+        await self.client.aclose()
+        self.assertEqual(self.requests, [])
+
+
+class SyncMetricBufferTest(unittest.TestCase):
+    def test_send_metric_outside_event_loop(self):
+        client = DatadogClient("api", "app")
+        with mock.patch("core.datadog_client.httpx.post", return_value=httpx.Response(202)) as post:
+            for i in range(client._metric_flush_size - 1):
+                client.send_metric("app.requests", i)
+            post.assert_not_called()
+
+            client.send_metric("app.requests", 99)
+            post.assert_called_once()
+            self.assertEqual(len(post.call_args.kwargs["json"]["series"][0]["points"]), client._metric_flush_size)
+
+            client.send_metric("app.requests", 100)
+            client.flush_metrics()
+            self.assertEqual(post.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Тесты сбора данных оркестратора без обращения к Datadog и OpenAI
+"""
+
+import asyncio
+import os
+import unittest
+
+import httpx
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from core.orchestrator import AIOrchestrator
+
+
+class FakeDatadogClient:
+    """Datadog клиент с фиксированными метриками; считает одновременные запросы"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+
+    async def get_system_metrics(self, hours_back: int = 1):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            return [
+                {"metric_name": "system.cpu.user", "series": [{"points": [[1700000000, 42.0]]}]},
+                {"metric_name": "system.mem.used", "series": [{"points": [[1700000000, 61.5]]}]},
+                {"metric_name": "system.disk.in_use", "series": [{"points": [[1700000000, 0.7]]}]},
+            ]
+        finally:
+            self.active -= 1
+
+    async def aclose(self):
+        pass
+
+
+class FetchDataTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.http = httpx.AsyncClient()
+        self.orchestrator = AIOrchestrator(dd_api_key="api", dd_app_key="app", max_parallel=2, http_client=self.http)
+        self.datadog = FakeDatadogClient()
+        self.orchestrator.data_agent.datadog_client = self.datadog
+        # Не пишем data/collected_data.json из тестов
+        self.orchestrator.data_agent._save_data = lambda collected_data: True
+
+    async def asyncTearDown(self):
+        await self.orchestrator.aclose()
+        await self.http.aclose()
+
+    async def test_fetch_one_returns_collected_data(self):
+        cpu_metrics = await self.orchestrator._fetch_one("cpu_metrics")
+        self.assertEqual([m["metric_name"] for m in cpu_metrics], ["system.cpu.user"])
+
+    async def test_fetch_one_unknown_type(self):
+        self.assertIsNone(await self.orchestrator._fetch_one("network_metrics"))
+
+    async def test_parallel_fetch_is_bounded(self):
+        data_types = ["cpu_metrics", "memory_metrics", "disk_metrics", "cpu_metrics"]
+        results = await asyncio.gather(*(self.orchestrator._fetch_one(data_type) for data_type in data_types))
+
+        self.assertEqual(results[0][0]["metric_name"], "system.cpu.user")
+        self.assertEqual(results[1][0]["metric_name"], "system.mem.used")
+        self.assertEqual(results[2][0]["metric_name"], "system.disk.in_use")
+        self.assertLessEqual(self.datadog.max_active, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()